@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import configure_connection
+        from .ratelimit import check_cache_backend
+
+        connection_created.connect(configure_connection,
+                                   dispatch_uid='core.db.configure')
+        checks.register(check_cache_backend)
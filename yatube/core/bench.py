@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext,
+                               setup_test_environment,
+                               teardown_test_environment)
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Одноразовая тестовая БД, чтобы замеры не трогали рабочие данные"""
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity,
+                                       autoclobber=True,
+                                       serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+        teardown_test_environment()
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def measure(func, repeat):
+    """Время вызовов func в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def measure_queries(func, repeat):
+    """Время вызовов func в миллисекундах и число SQL-запросов каждого"""
+    timings, queries = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+    return timings, queries
+
+
+def summarize(timings, queries=()):
+    summary = {
+        f'p{percent}_ms': round(percentile(timings, percent), 3)
+        for percent in (50, 95, 99)
+    }
+    summary['mean_ms'] = round(sum(timings) / len(timings), 3)
+    if queries:
+        summary['queries'] = max(queries)
+    return summary
+
+
+def compare_reports(baseline, current, threshold):
+    """Регрессии current относительно baseline.
+
+    Регрессия - p95 хуже больше чем на threshold процентов или больше
+    запросов. Возвращает список строк (название, что ухудшилось).
+    """
+    regressions = []
+    for name, result in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        limit = old['p95_ms'] * (1 + threshold / 100)
+        if result['p95_ms'] > limit:
+            regressions.append(
+                (name, f'p95 {old["p95_ms"]} -> {result["p95_ms"]} мс'))
+        if result.get('queries', 0) > old.get('queries', 0):
+            regressions.append(
+                (name, f'запросов {old.get("queries", 0)} -> '
+                       f'{result["queries"]}'))
+    return regressions
@@ -0,0 +1,139 @@
+"""Тонкая обёртка над общим кэшем проекта.
+
+Все процессы (воркеры gunicorn) видят один и тот же бэкенд из
+settings.CACHES, поэтому версии и фрагменты, записанные одним
+воркером, сразу доступны остальным.
+"""
+import hashlib
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+DEFAULT_ALIAS = 'default'
+
+# Счётчики попаданий текущего процесса, см. cache_stats().
+_stats = Counter()
+
+
+def get_cache(alias=DEFAULT_ALIAS):
+    return caches[alias]
+
+
+def make_key(*parts):
+    return ':'.join(str(part) for part in parts)
+
+
+def get_version(scope, alias=DEFAULT_ALIAS):
+    """Текущая версия области кэша, заводит её при первом обращении"""
+    cache = get_cache(alias)
+    key = make_key('version', scope)
+    version = cache.get(key)
+    if version is None:
+        # Новая версия не совпадёт ни с одной из вытесненных раньше.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(scopes, alias=DEFAULT_ALIAS):
+    """Версии нескольких областей одним обращением к кэшу"""
+    keys = {make_key('version', scope): scope for scope in scopes}
+    found = get_cache(alias).get_many(list(keys))
+    return [found[key] if key in found else get_version(scope, alias)
+            for key, scope in keys.items()]
+
+
+def bump(*scopes, alias=DEFAULT_ALIAS):
+    """Сбрасывает всё, что закэшировано под версиями этих областей"""
+    now = time.time_ns()
+    get_cache(alias).set_many(
+        {make_key('version', scope): now for scope in scopes}, None)
+
+
+def remember(key, func, timeout=None, alias=DEFAULT_ALIAS):
+    """Значение из кэша или результат func(), сохранённый в кэш"""
+    cache = get_cache(alias)
+    value = cache.get(key)
+    if value is not None:
+        _stats['hits'] += 1
+        return value
+    _stats['misses'] += 1
+    value = func()
+    cache.set(key, value, timeout)
+    return value
+
+
+def fragment_key(name, scope, vary=(), alias=DEFAULT_ALIAS):
+    """Ключ фрагмента шаблона: сбрасывается вместе с версией scope"""
+    digest = hashlib.md5(
+        ':'.join(str(value) for value in vary).encode()).hexdigest()
+    return make_key('fragment', name, scope, get_version(scope, alias),
+                    digest)
+
+
+def cache_stats():
+    total = _stats['hits'] + _stats['misses']
+    pages = _stats['page_hits'] + _stats['page_misses']
+    return {
+        'hits': _stats['hits'],
+        'misses': _stats['misses'],
+        'hit_rate': _stats['hits'] / total if total else None,
+        'page_hits': _stats['page_hits'],
+        'page_misses': _stats['page_misses'],
+        'page_hit_rate': _stats['page_hits'] / pages if pages else None,
+    }
+
+
+def is_anonymous_get(request):
+    """GET без сессии и сообщений, сессию трогаем только при её cookie"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if 'messages' in request.COOKIES:
+        return False
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def page_key(request, scopes, alias=DEFAULT_ALIAS):
+    versions = [get_version(scope, alias) for scope in scopes]
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return make_key('page', *scopes, *versions, path)
+
+
+def cache_anonymous_page(get_scopes, timeout=None, alias=DEFAULT_ALIAS):
+    """Кэширует страницу целиком для анонимных GET.
+
+    get_scopes(request, *args, **kwargs) отдаёт области, версии которых
+    входят в ключ (их сбрасывает bump), или None - тогда без кэша.
+    Ответ с CSRF-токеном или cookie не кэшируется: он личный.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_anonymous_get(request):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            cache = get_cache(alias)
+            key = page_key(request, scopes, alias)
+            response = cache.get(key)
+            if response is not None:
+                _stats['page_hits'] += 1
+                return response
+            _stats['page_misses'] += 1
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_USED')):
+                cache.set(key, response, timeout if timeout is not None
+                          else getattr(settings, 'PAGE_CACHE_TTL', 600))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,34 @@
+"""Настройка соединений SQLite.
+
+На каждом новом соединении выполняются PRAGMA из SQLITE_PRAGMAS: WAL
+даёт читателям не ждать писателя, synchronous=NORMAL в WAL безопасен
+и не делает fsync на каждый коммит, busy_timeout заставляет писателей
+ждать блокировку, а не падать с 'database is locked'. Вместе с
+CONN_MAX_AGE соединение и его настройки переживают запрос.
+"""
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+}
+
+
+def get_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+
+def apply_pragmas(connection, pragmas):
+    """connection - соединение sqlite3, без обёрток и логов Django"""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created"""
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection, get_pragmas())
@@ -0,0 +1,185 @@
+"""Очередь отложенных задач.
+
+Задача - функция с декоратором @job, аргументы - JSON-совместимые
+kwargs. Режим задаёт JOBS_BACKEND:
+
+* 'database' - enqueue пишет строку Job в текущую транзакцию: задача
+  появится у воркера (`manage.py run_jobs`) только вместе с данными,
+  ради которых её поставили, и пропадёт при откате;
+* 'thread' - по явному выбору: после коммита задача уходит в пул
+  потоков текущего процесса. С SQLite её записи спорят с запросами за
+  блокировку базы, поэтому по умолчанию везде 'database'.
+
+В обоих режимах одновременно выполняется не больше JOBS_CONCURRENCY
+задач, упавшая задача повторяется с растущей задержкой до
+max_attempts раз. Выполненные задачи воркер удаляет через
+JOBS_RETENTION_DAYS дней.
+"""
+import json
+import logging
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_executor = None
+
+
+class JobSpec:
+    def __init__(self, func, name, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def backoff(self, attempt):
+        """Задержка перед следующей попыткой, в секундах"""
+        return self.retry_delay * 2 ** (attempt - 1)
+
+
+def job(max_attempts=3, retry_delay=10):
+    """Регистрирует функцию как задачу; func.delay(**kwargs) ставит её"""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _registry[name] = JobSpec(func, name, max_attempts, retry_delay)
+        func.delay = lambda **kwargs: enqueue(name, **kwargs)
+        return func
+    return decorator
+
+
+def get_spec(name):
+    if name not in _registry:
+        # Воркер мог ещё не импортировать модуль с задачей.
+        import_string(name)
+    return _registry[name]
+
+
+def get_backend():
+    return getattr(settings, 'JOBS_BACKEND', 'database')
+
+
+def get_concurrency():
+    return getattr(settings, 'JOBS_CONCURRENCY', 2)
+
+
+def enqueue(job_name, **kwargs):
+    spec = get_spec(job_name)
+    payload = json.dumps(kwargs)
+    if get_backend() == 'database':
+        return Job.objects.create(name=job_name, payload=payload,
+                                  max_attempts=spec.max_attempts)
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run_in_thread, spec, payload))
+    return None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=get_concurrency(),
+                                       thread_name_prefix='jobs')
+    return _executor
+
+
+def _run_in_thread(spec, payload):
+    for attempt in range(1, spec.max_attempts + 1):
+        close_old_connections()
+        try:
+            spec.func(**json.loads(payload))
+            return
+        except Exception:
+            logger.exception('Задача %s упала, попытка %s',
+                             spec.name, attempt)
+            if attempt < spec.max_attempts:
+                time.sleep(spec.backoff(attempt))
+        finally:
+            close_old_connections()
+
+
+def _claimable(now):
+    stale = now - timedelta(
+        seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', 300))
+    # Задачи, чей воркер умер, не дождавшись конца, забираются заново.
+    return (Q(status=Job.QUEUED, run_after__lte=now)
+            | Q(status=Job.RUNNING, locked_at__lt=stale))
+
+
+def claim(limit, worker=None):
+    """Забирает до limit готовых задач.
+
+    Каждую - условным UPDATE, поэтому два воркера не возьмут одну.
+    """
+    worker = worker or socket.gethostname()
+    now = timezone.now()
+    candidates = Job.objects.filter(_claimable(now)).order_by(
+        'run_after', 'pk').values_list('pk', flat=True)[:limit]
+    claimed = [
+        pk for pk in candidates
+        if Job.objects.filter(_claimable(now), pk=pk).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F('attempts') + 1)
+    ]
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def run_job(job):
+    """Выполняет взятую задачу и записывает результат"""
+    try:
+        get_spec(job.name).func(**json.loads(job.payload))
+    except Exception:
+        logger.exception('Задача %s (%s) упала', job.name, job.pk)
+        now = timezone.now()
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = now
+        else:
+            job.status = Job.QUEUED
+            delay = _registry[job.name].backoff(job.attempts) if (
+                job.name in _registry) else 0
+            job.run_after = now + timedelta(seconds=delay)
+        job.save(update_fields=['status', 'run_after', 'finished_at',
+                                'last_error'])
+        return False
+    job.status = Job.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return True
+
+
+def run_pending(limit=None, worker=None):
+    """Выполняет готовые задачи по очереди, возвращает их число"""
+    jobs = claim(limit or get_concurrency(), worker)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+
+def prune_jobs(days=None, batch_size=500):
+    """Удаляет выполненные задачи старше days дней, возвращает их число.
+
+    Удаляет пачками, чтобы не держать блокировку записи долго.
+    Упавшие задачи остаются для разбора.
+    """
+    if days is None:
+        days = getattr(settings, 'JOBS_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    finished = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff)
+    total = 0
+    while True:
+        pks = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return total
+        total += Job.objects.filter(pk__in=pks).delete()[0]
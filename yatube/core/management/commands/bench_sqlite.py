@@ -0,0 +1,131 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.bench import percentile
+from core.db import apply_pragmas, get_pragmas
+
+# Настройки SQLite по умолчанию, с которыми Django открывает соединение.
+DEFAULT_MODE = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'author_id INTEGER NOT NULL, text TEXT NOT NULL, '
+    'pub_date REAL NOT NULL)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE TABLE stats (user_id INTEGER PRIMARY KEY, '
+    'posts_count INTEGER NOT NULL)',
+)
+
+
+def prepare(path, pragmas, rows, authors):
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+        ((number % authors, f'Пост {number}', number)
+         for number in range(rows)))
+    connection.executemany('INSERT INTO stats VALUES (?, 0)',
+                           ((author,) for author in range(authors)))
+    connection.execute('COMMIT')
+    connection.close()
+
+
+def run_worker(path, pragmas, role, duration, authors, seed):
+    """Крутит записи (как post_create) или чтения ленты до дедлайна"""
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    timings, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'write':
+                author = rng.randrange(authors)
+                connection.execute('BEGIN')
+                connection.execute(
+                    'INSERT INTO post (author_id, text, pub_date) '
+                    'VALUES (?, ?, ?)', (author, 'Новый пост', time.time()))
+                connection.execute(
+                    'UPDATE stats SET posts_count = posts_count + 1 '
+                    'WHERE user_id = ?', (author,))
+                connection.execute('COMMIT')
+            else:
+                connection.execute(
+                    'SELECT id, author_id, text FROM post '
+                    'ORDER BY pub_date DESC LIMIT 10').fetchall()
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+    connection.close()
+    return role, timings, errors
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite с настройками по '
+            'умолчанию и с SQLITE_PRAGMAS при параллельных воркерах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Секунд на каждый режим')
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда сохранить отчёт')
+
+    def run_mode(self, pragmas, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            prepare(path, pragmas, options['rows'], options['authors'])
+            roles = (['write'] * options['writers']
+                     + ['read'] * options['readers'])
+            with multiprocessing.Pool(len(roles)) as pool:
+                results = pool.starmap(run_worker, [
+                    (path, pragmas, role, options['duration'],
+                     options['authors'], seed)
+                    for seed, role in enumerate(roles)
+                ])
+        report = {}
+        for role in ('write', 'read'):
+            timings = [timing for kind, values, _ in results
+                       if kind == role for timing in values]
+            report[role] = {
+                'ops_per_second': round(len(timings) / options['duration'],
+                                        1),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'errors': sum(errors for kind, _, errors in results
+                              if kind == role),
+            }
+        return report
+
+    def handle(self, *args, **options):
+        report = {}
+        for name, pragmas in (('default', DEFAULT_MODE),
+                              ('tuned', get_pragmas())):
+            report[name] = self.run_mode(pragmas, options)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for role, result in report[name].items():
+                self.stdout.write(
+                    f'  {role}: {result["ops_per_second"]} оп/с, '
+                    f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                    f'p99 {result["p99_ms"]} мс, ошибок {result["errors"]}')
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,72 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import get_concurrency, prune_jobs, run_pending
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задачи очереди core.jobs из таблицы Job '
+            '(режим JOBS_BACKEND = "database")')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=get_concurrency(),
+                            help='Сколько задач выполнять одновременно')
+        parser.add_argument('--poll', type=float, default=1,
+                            help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--keep-days', type=int, default=None,
+                            help='Сколько дней хранить выполненные задачи '
+                                 '(по умолчанию JOBS_RETENTION_DAYS)')
+        parser.add_argument('--prune-every', type=float, default=60 * 60,
+                            help='Как часто удалять старые задачи, с')
+
+    def work(self, worker, options, totals):
+        while True:
+            close_old_connections()
+            done = run_pending(limit=1, worker=worker)
+            totals[worker] = totals.get(worker, 0) + done
+            if not done:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        close_old_connections()
+
+    def prune(self, options):
+        try:
+            return prune_jobs(options['keep_days'])
+        finally:
+            close_old_connections()
+
+    def handle(self, *args, **options):
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        totals = {}
+        threads = [
+            threading.Thread(target=self.work, daemon=True,
+                             args=(f'{prefix}:{number}', options, totals))
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            # Пока воркеры работают, главный поток чистит таблицу Job.
+            pruned = self.prune(options)
+            if options['once']:
+                for thread in threads:
+                    thread.join()
+            while not options['once']:
+                time.sleep(options['prune_every'])
+                pruned += self.prune(options)
+        except KeyboardInterrupt:
+            # Взятые задачи заберут снова после JOBS_LOCK_TIMEOUT.
+            pass
+        else:
+            self.stdout.write(f'Удалено старых задач: {pruned}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано задач: {sum(totals.values())}'))
@@ -0,0 +1,173 @@
+"""Замеры запросов: число и время SQL, рендер шаблонов, общее время.
+
+Замеряется доля запросов TIMING_SAMPLE_RATE. Замеренный ответ получает
+заголовок Server-Timing, строка уходит в лог yatube.timing (уровень
+INFO, JSON), а сводка по имени URL копится в памяти процесса и видна
+администраторам на /admin/metrics/. Время SQL, выполненного во время
+рендера (ленивые QuerySet в шаблоне), входит и в sql, и в tpl.
+
+Время рендера копится и по каждому шаблону и include отдельно, вместе
+с вложенными в него: так видно, сколько стоит, например, цикл ленты.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+from .bench import percentile
+
+logger = logging.getLogger('yatube.timing')
+
+# Сколько последних замеров на URL хранить для перцентилей.
+RECENT_SIZE = 1000
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.templates = defaultdict(lambda: [0, 0.0])
+        self.depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+
+
+def _timed_render(original):
+    def render(self, context):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None:
+            return original(self, context)
+        metrics.depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            metrics.depth -= 1
+            renders = metrics.templates[self.name or '<string>']
+            renders[0] += 1
+            renders[1] += elapsed
+            if not metrics.depth:
+                metrics.template_ms += elapsed
+    render.timed = True
+    return render
+
+
+def _install_template_timer():
+    if not getattr(Template._render, 'timed', False):
+        Template._render = _timed_render(Template._render)
+
+
+def _record(name, metrics, total_ms):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = defaultdict(float)
+            stats['recent'] = deque(maxlen=RECENT_SIZE)
+            stats['templates'] = defaultdict(lambda: [0, 0.0])
+        stats['count'] += 1
+        stats['queries'] += metrics.queries
+        stats['sql_ms'] += metrics.sql_ms
+        stats['template_ms'] += metrics.template_ms
+        stats['total_ms'] += total_ms
+        stats['max_ms'] = max(stats['max_ms'], total_ms)
+        stats['recent'].append(total_ms)
+        for name, (count, elapsed) in metrics.templates.items():
+            stats['templates'][name][0] += count
+            stats['templates'][name][1] += elapsed
+
+
+def timing_stats():
+    """Средние и перцентили по каждому имени URL"""
+    with _lock:
+        snapshot = {
+            name: (dict(stats), list(stats['recent']),
+                   {template: tuple(value)
+                    for template, value in stats['templates'].items()})
+            for name, stats in _stats.items()
+        }
+    report = {}
+    for name, (stats, recent, templates) in snapshot.items():
+        count = stats['count']
+        report[name] = {
+            'count': int(count),
+            'avg_queries': round(stats['queries'] / count, 2),
+            'avg_sql_ms': round(stats['sql_ms'] / count, 3),
+            'avg_template_ms': round(stats['template_ms'] / count, 3),
+            'avg_ms': round(stats['total_ms'] / count, 3),
+            'p50_ms': round(percentile(recent, 50), 3),
+            'p95_ms': round(percentile(recent, 95), 3),
+            'max_ms': round(stats['max_ms'], 3),
+            'templates': {
+                template: {
+                    'renders': round(renders / count, 2),
+                    'avg_ms': round(elapsed / count, 3),
+                }
+                for template, (renders, elapsed) in sorted(
+                    templates.items(), key=lambda item: -item[1][1])
+            },
+        }
+    return report
+
+
+def reset_timing_stats():
+    with _lock:
+        _stats.clear()
+
+
+class TimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        if random.random() >= getattr(settings, 'TIMING_SAMPLE_RATE', 1.0):
+            return self.get_response(request)
+        metrics = _local.metrics = RequestMetrics()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        total_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        name = match.view_name if match else '<unresolved>'
+        _record(name, metrics, total_ms)
+        response['Server-Timing'] = (
+            f'sql;dur={metrics.sql_ms:.1f};desc="{metrics.queries} queries", '
+            f'tpl;dur={metrics.template_ms:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'url_name': name,
+                'method': request.method,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                'sql_ms': round(metrics.sql_ms, 3),
+                'template_ms': round(metrics.template_ms, 3),
+                'total_ms': round(total_ms, 3),
+            }))
+        return response
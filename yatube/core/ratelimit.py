@@ -0,0 +1,113 @@
+"""Ограничение частоты запросов на запись.
+
+Счётчик на окно фиксированной длины хранится в кэше и растёт через
+cache.add/cache.incr. Ключ - пользователь или, для анонимов, IP.
+Превысивший лимит получает 429 с Retry-After до конца окна, а не ждёт
+блокировки записи SQLite вместе со всеми.
+
+Лимит точен и общий для всех воркеров только на memcached или redis:
+там incr атомарен на сервере. У file и db incr - чтение и запись
+подряд, параллельные запросы теряют приращения, а locmem у каждого
+процесса свой. На таких бэкендах при старте выводится предупреждение
+core.W001, и лимит остаётся лишь приблизительным.
+
+Лимиты задаются в RATE_LIMITS строками вида '10/m' (s, m, h, d).
+На границе окон возможна серия до двух лимитов подряд.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.shortcuts import render
+
+from .cache import DEFAULT_ALIAS, get_cache, make_key
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+# Бэкенды, у которых incr атомарен и общий для всех процессов.
+ATOMIC_BACKENDS = (
+    'django.core.cache.backends.memcached.',
+    'django_redis.',
+)
+# Один процесс разработки или тестов: неточность лимитов не мешает.
+LOCAL_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def check_cache_backend(app_configs, **kwargs):
+    """Предупреждает, если RATE_LIMITS работают на неатомарном кэше.
+
+    Молчит при DEBUG и на locmem: там предупреждение не к чему
+    применить, а выводилось бы на каждый вызов manage.py.
+    """
+    if not getattr(settings, 'RATE_LIMITS', None) or settings.DEBUG:
+        return []
+    backend = settings.CACHES[DEFAULT_ALIAS]['BACKEND']
+    if backend.startswith(ATOMIC_BACKENDS) or backend == LOCAL_BACKEND:
+        return []
+    return [checks.Warning(
+        f'RATE_LIMITS на кэше {backend} приблизительны: счётчики '
+        'теряют приращения или не общие для процессов.',
+        hint='Используйте memcached или redis (YATUBE_CACHE).',
+        id='core.W001',
+    )]
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def get_rate(scope):
+    rate = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+    return parse_rate(rate) if rate else None
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def hit(scope, key, limit, period):
+    """Учитывает запрос; 0, если он в лимите, иначе секунды до нового окна"""
+    now = time.time()
+    window = int(now // period)
+    cache_key = make_key('ratelimit', scope, key, window)
+    cache = get_cache()
+    # Ключ живёт чуть дольше окна, чтобы incr не попал в истёкший.
+    if cache.add(cache_key, 1, period + 1):
+        count = 1
+    else:
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # Ключ вытеснили между add и incr.
+            cache.add(cache_key, 1, period + 1)
+            count = 1
+    if count <= limit:
+        return 0
+    return max(1, math.ceil((window + 1) * period - now))
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html',
+                      {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Лимит RATE_LIMITS[scope] на запросы methods к view"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate = get_rate(scope)
+            if rate and request.method in methods:
+                retry_after = hit(scope, client_key(request), *rate)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+"""Чтение с реплик для безопасных запросов, запись - в default.
+
+ReplicaMiddleware разрешает чтение с реплики только на время GET/HEAD
+запроса к view, отмеченной @replica_reads, - то есть заведомо ничего
+не пишущей. Всё остальное (POST, GET с записью вроде подписки, команды,
+фоновые задачи) читает с primary, а внутри transaction.atomic чтение
+всегда идёт туда же, куда запись. После любого запроса, который что-то
+записал, браузер получает cookie, и ещё REPLICA_STICKY_SECONDS его
+запросы читают с primary: автор сразу видит свой новый пост или
+подписку, даже если реплика отстаёт.
+"""
+import random
+import threading
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLAC')
+
+_local = threading.local()
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def replica_reads(view):
+    """Отмечает view, которая только читает: её GET можно читать с реплики"""
+    view.replica_reads = True
+    return view
+
+
+def _atomic_depth():
+    connection = connections[DEFAULT_DB_ALIAS]
+    return connection.in_atomic_block + len(connection.savepoint_ids)
+
+
+class use_primary(ContextDecorator):
+    """Читать с primary внутри блока или view, даже в GET"""
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'read_db', None)
+        _local.read_db = None
+
+    def __exit__(self, *exc_info):
+        _local.read_db = self.previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        read_db = getattr(_local, 'read_db', None)
+        if read_db is None or _atomic_depth() > _local.base_depth:
+            # В транзакции читаем то, что она же и пишет.
+            return DEFAULT_DB_ALIAS
+        return read_db
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии default, объекты с них совместимы.
+        return True
+
+
+class WriteDetector:
+    """Обёртка execute_wrapper: замечает запросы на запись"""
+
+    def __init__(self):
+        self.seen = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.seen:
+            self.seen = sql.lstrip()[:6].upper() in WRITE_STATEMENTS
+        return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+        writes = WriteDetector()
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(writes):
+                response = self.get_response(request)
+        finally:
+            _local.read_db = None
+        if writes.seen:
+            response.set_cookie(STICKY_COOKIE, '1',
+                                max_age=get_sticky_seconds(),
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (get_replicas() and request.method in SAFE_METHODS
+                and STICKY_COOKIE not in request.COOKIES
+                and getattr(view_func, 'replica_reads', False)):
+            _local.base_depth = _atomic_depth()
+            _local.read_db = random.choice(get_replicas())
@@ -0,0 +1,42 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import cache
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, timeout, name, scope, vary):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.scope = scope
+        self.vary = vary
+
+    def render(self, context):
+        key = cache.fragment_key(
+            self.name, self.scope.resolve(context),
+            [value.resolve(context) for value in self.vary])
+        return mark_safe(cache.remember(
+            key, lambda: self.nodelist.render(context),
+            self.timeout.resolve(context)))
+
+
+@register.tag
+def fragment(parser, token):
+    """Кэш куска шаблона через core.cache.remember.
+
+    {% fragment timeout name scope [vary ...] %} ... {% endfragment %}
+    Как {% cache %}, но ключ включает версию области scope, поэтому
+    cache.bump(scope) сбрасывает фрагмент, а попадания видны в метриках.
+    """
+    bits = token.split_contents()
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' ждёт timeout, имя фрагмента и область")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), bits[2],
+                        parser.compile_filter(bits[3]),
+                        [parser.compile_filter(bit) for bit in bits[4:]])
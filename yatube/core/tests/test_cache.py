@@ -0,0 +1,52 @@
+from django.core.cache import cache as default_cache
+from django.template import Context, Template
+from django.test import TestCase
+
+from core import cache
+
+FRAGMENT = Template(
+    '{% load fragment_cache %}'
+    '{% fragment 60 feed scope page %}{{ text }}{% endfragment %}')
+
+
+class ScopeVersionTest(TestCase):
+    def setUp(self):
+        default_cache.clear()
+
+    def test_version_is_stable_until_bump(self):
+        version = cache.get_version('index')
+        self.assertEqual(cache.get_version('index'), version)
+        cache.bump('index')
+        self.assertGreater(cache.get_version('index'), version)
+
+    def test_bump_touches_only_given_scopes(self):
+        other = cache.get_version('group:1')
+        cache.get_version('profile:1')
+        cache.bump('profile:1')
+        self.assertEqual(cache.get_version('group:1'), other)
+
+    def test_get_versions_matches_get_version(self):
+        cache.bump('post:1')
+        self.assertEqual(cache.get_versions(['post:1', 'post:2']),
+                         [cache.get_version('post:1'),
+                          cache.get_version('post:2')])
+
+
+class FragmentTagTest(TestCase):
+    def setUp(self):
+        default_cache.clear()
+
+    def render(self, text, page=1):
+        return FRAGMENT.render(Context({'scope': 'index', 'page': page,
+                                        'text': text}))
+
+    def test_fragment_is_cached_until_scope_bump(self):
+        before = cache.cache_stats()
+        self.assertEqual(self.render('Старый'), 'Старый')
+        self.assertEqual(self.render('Новый'), 'Старый')
+        self.assertEqual(self.render('Другая', page=2), 'Другая')
+        cache.bump('index')
+        self.assertEqual(self.render('Новый'), 'Новый')
+        stats = cache.cache_stats()
+        self.assertEqual(stats['hits'] - before['hits'], 1)
+        self.assertEqual(stats['misses'] - before['misses'], 3)
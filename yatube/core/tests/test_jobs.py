@@ -0,0 +1,97 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.jobs import job, prune_jobs, run_pending
+from core.models import Job
+
+calls = []
+
+
+@job(max_attempts=2, retry_delay=0)
+def record_call(text):
+    calls.append(text)
+
+
+@job(max_attempts=2, retry_delay=0)
+def always_fail():
+    raise ValueError('Сломалось')
+
+
+@override_settings(JOBS_BACKEND='database')
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_stores_job_until_worker_runs_it(self):
+        """Задача ждёт в таблице и выполняется воркером один раз"""
+        record_call.delay(text='Привет')
+        self.assertEqual(calls, [])
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ['Привет'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(run_pending(), 0)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        """Упавшая задача повторяется до max_attempts"""
+        always_fail.delay()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('Сломалось', job.last_error)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(run_pending(), 0)
+
+    def test_stale_running_job_is_reclaimed(self):
+        """Задачу упавшего воркера забирают после JOBS_LOCK_TIMEOUT"""
+        record_call.delay(text='Снова')
+        Job.objects.update(status=Job.RUNNING, attempts=1,
+                           locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ['Снова'])
+
+    def test_prune_removes_only_old_finished_jobs(self):
+        """Выполненные задачи старше срока удаляются, остальные нет"""
+        for text in ('Старая', 'Свежая', 'В очереди'):
+            record_call.delay(text=text)
+        old, fresh, queued = Job.objects.order_by('pk')
+        Job.objects.filter(pk__in=[old.pk, fresh.pk]).update(
+            status=Job.DONE, finished_at=timezone.now() - timedelta(days=1))
+        Job.objects.filter(pk=old.pk).update(
+            finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune_jobs(days=7, batch_size=1), 1)
+        self.assertQuerysetEqual(Job.objects.order_by('pk'),
+                                 [fresh.pk, queued.pk],
+                                 transform=lambda item: item.pk)
+
+    def test_prune_keeps_failed_jobs(self):
+        """Упавшие задачи остаются для разбора"""
+        always_fail.delay()
+        Job.objects.update(status=Job.FAILED,
+                           finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune_jobs(days=7), 0)
+        self.assertTrue(Job.objects.exists())
+
+    def test_worker_prunes_old_jobs(self):
+        """run_jobs чистит старые задачи, не дожидаясь очереди"""
+        record_call.delay(text='Старая')
+        Job.objects.update(status=Job.DONE,
+                           finished_at=timezone.now() - timedelta(days=30))
+        out = StringIO()
+        # Без воркеров: потоки не видят данных транзакции теста.
+        call_command('run_jobs', once=True, concurrency=0, keep_days=7,
+                     stdout=out)
+        self.assertIn('Удалено старых задач: 1', out.getvalue())
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import reset_timing_stats, timing_stats
+from posts.models import Post, User
+from posts.utils import POSTS_PER_PAGE
+
+
+@override_settings(TIMING_SAMPLE_RATE=1.0)
+class TimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_timing_stats()
+
+    def test_sampled_response_has_server_timing(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    def test_metrics_are_admin_only(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        admin = User.objects.create_superuser(
+            username='Ops', email='ops@example.com', password='pass')
+        self.client.force_login(admin)
+        stats = self.client.get(reverse('metrics')).json()['requests']
+        self.assertEqual(stats['app_posts:index']['count'], 1)
+        self.assertGreater(stats['app_posts:index']['avg_queries'], 0)
+
+    def test_templates_are_profiled_once_per_feed(self):
+        user = User.objects.create_user(username='Profiled')
+        Post.objects.bulk_create(Post(author=user, text=f'Пост {number}')
+                                 for number in range(POSTS_PER_PAGE))
+        self.client.get(reverse('posts:index'))
+        templates = timing_stats()['app_posts:index']['templates']
+        self.assertEqual(
+            templates['posts/includes/post_feed.html']['renders'], 1)
+        self.assertIn('base.html', templates)
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.ratelimit import check_cache_backend
+from posts.models import Post, User
+
+
+@override_settings(RATE_LIMITS={'add_comment': '2/m', 'signup': '1/h'})
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='chatty')
+        self.post = Post.objects.create(author=self.user, text='Обсуждаем')
+        self.client.force_login(self.user)
+        self.url = reverse('posts:add_comment',
+                           kwargs={'post_id': self.post.pk})
+
+    def test_over_limit_returns_429_with_retry_after(self):
+        """Сверх лимита - 429 с Retry-After, комментарий не пишется"""
+        for _ in range(2):
+            self.assertEqual(
+                self.client.post(self.url, {'text': 'Ещё'}).status_code, 302)
+        response = self.client.post(self.url, {'text': 'Ещё'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+        self.assertEqual(self.post.comments.count(), 2)
+
+    def test_limit_is_per_user(self):
+        for _ in range(3):
+            self.client.post(self.url, {'text': 'Ещё'})
+        other = Client()
+        other.force_login(User.objects.create_user(username='quiet'))
+        self.assertEqual(other.post(self.url, {'text': 'Моё'}).status_code,
+                         302)
+
+    def test_anonymous_limit_is_per_ip(self):
+        """Регистрация ограничена по IP, GET формы не считается"""
+        url = reverse('users:signup')
+        anonymous = Client()
+        self.assertEqual(anonymous.get(url).status_code, 200)
+        anonymous.post(url, {'username': 'first'})
+        self.assertEqual(anonymous.post(url, {'username': 'second'})
+                         .status_code, 429)
+        self.assertEqual(
+            anonymous.post(url, {'username': 'third'},
+                           REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    @override_settings(DEBUG=False)
+    def test_non_atomic_cache_is_reported(self):
+        """Лимиты на кэше без атомарного incr дают предупреждение"""
+        backend = 'django.core.cache.backends.filebased.FileBasedCache'
+        with override_settings(CACHES={'default': {'BACKEND': backend}}):
+            self.assertEqual([warning.id for warning
+                              in check_cache_backend(None)], ['core.W001'])
+            with override_settings(DEBUG=True):
+                self.assertEqual(check_cache_backend(None), [])
+        for backend in ('django.core.cache.backends.memcached.MemcachedCache',
+                        'django.core.cache.backends.locmem.LocMemCache'):
+            with override_settings(CACHES={'default': {'BACKEND': backend}}):
+                self.assertEqual(check_cache_backend(None), [])
@@ -0,0 +1,82 @@
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.routers import STICKY_COOKIE, ReplicaMiddleware, replica_reads, \
+    use_primary
+from posts.models import Post, User
+
+
+def read_post_db():
+    return router.db_for_read(Post)
+
+
+@replica_reads
+def replica_post_db():
+    return read_post_db()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def read_db(self, request, view=replica_post_db, write=False):
+        """Куда роутер отправит чтение постов внутри запроса"""
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            response = HttpResponse()
+            response.read_db = view()
+            if write:
+                User.objects.create_user(username='Writer')
+            return response
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_get_reads_from_replica(self):
+        response = self.read_db(self.factory.get('/'))
+        self.assertEqual(response.read_db, 'replica')
+        self.assertEqual(read_post_db(), 'default')
+
+    def test_unmarked_view_reads_primary(self):
+        response = self.read_db(self.factory.get('/'), read_post_db)
+        self.assertEqual(response.read_db, 'default')
+
+    def test_write_sticks_to_primary(self):
+        """Cookie ставит любой запрос с записью, даже GET"""
+        response = self.read_db(self.factory.get('/'), write=True)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(self.read_db(request).read_db, 'default')
+
+    def test_read_only_request_does_not_stick(self):
+        response = self.read_db(self.factory.post('/'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_atomic_block_reads_primary(self):
+        def view():
+            with transaction.atomic():
+                return read_post_db()
+        response = self.read_db(self.factory.get('/'), replica_reads(view))
+        self.assertEqual(response.read_db, 'default')
+
+    def test_use_primary_overrides_replica(self):
+        response = self.read_db(self.factory.get('/'),
+                                replica_reads(use_primary()(read_post_db)))
+        self.assertEqual(response.read_db, 'default')
+
+    def test_follow_is_visible_on_next_read(self):
+        """Подписка (GET) не читает реплику и сразу видна в профиле.
+
+        Алиаса replica в тестах нет: любое чтение с неё упадёт.
+        """
+        author = User.objects.create_user(username='Followed')
+        self.client.force_login(User.objects.create_user(username='Fan'))
+        response = self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': author.username}))
+        self.assertTrue(response.context['following'])
@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .cache import cache_stats
+from .middleware import reset_timing_stats, timing_stats
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +12,14 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def metrics(request):
+    """Сводка замеров TimingMiddleware и кэша текущего процесса"""
+    if request.GET.get('reset'):
+        reset_timing_stats()
+    return JsonResponse({
+        'requests': timing_stats(),
+        'cache': cache_stats(),
+    })
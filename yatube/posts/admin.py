@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
@@ -9,6 +10,14 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу posts.search вместо LIKE '%term%' по всей таблице.
+        if not search_term:
+            return queryset, False
+        ids = search.search_ids(search_term, self.search_limit)
+        return queryset.filter(pk__in=ids), False
 
 
 class GroupAdmin(admin.ModelAdmin):
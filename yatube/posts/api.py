@@ -0,0 +1,181 @@
+"""JSON-версии лент для клиентов, которые опрашивают их по ETag.
+
+ETag и Last-Modified считаются одним агрегатным запросом: число постов
+ленты и время последнего изменения (Post.updated). В ETag входит ещё
+версия области кэша (posts.cache), которую сигналы меняют при правке и
+удалении поста, а момент её смены учитывается в Last-Modified. Лента
+подписок берёт число и дату из своих FeedEntry, а вместо одной
+области - версии профилей всех, на кого подписан читатель.
+Неизменившаяся лента отвечает 304 без выборки и сериализации постов.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from core import cache as core_cache
+from core.routers import replica_reads
+
+from . import cache, feed, notifications
+from .models import FeedEntry, Follow, Group, Post, User
+from .utils import get_cursor_pag
+
+
+def _version_time(versions):
+    """Момент последней смены версий (они - time.time_ns() смены)"""
+    if not versions:
+        return None
+    return datetime.fromtimestamp(max(versions) / 1e9, tz=timezone.utc)
+
+
+def _make_state(count, newest, versions):
+    changed = max(filter(None, (newest, _version_time(versions))),
+                  default=None)
+    stamp = int(changed.timestamp() * 1_000_000) if changed else 0
+    digest = hashlib.md5(
+        ','.join(map(str, versions)).encode()).hexdigest()[:12]
+    return f'{count}-{stamp}-{digest}', changed
+
+
+def feed_state(posts, scope=None):
+    """(etag, last_modified) ленты"""
+    state = posts.order_by().aggregate(newest=Max('updated'),
+                                       count=Count('pk'))
+    versions = [core_cache.get_version(scope)] if scope else []
+    return _make_state(state['count'], state['newest'], versions)
+
+
+def follow_feed_state(user):
+    """(etag, last_modified) ленты подписок без JOIN Follow и Post"""
+    state = FeedEntry.objects.filter(user=user).aggregate(
+        newest=Max('pub_date'), count=Count('pk'))
+    author_ids = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True)
+    # Правка, удаление и посты авторов, читаемых на лету, меняют
+    # версию профиля автора.
+    versions = core_cache.get_versions(
+        [cache.profile_scope(author_id) for author_id in author_ids])
+    return _make_state(state['count'], state['newest'], versions)
+
+
+def conditional_feed(source, state=None):
+    """Условный GET для ленты, которую отдаёт source(request, **kwargs).
+
+    source возвращает (queryset постов, область кэша или None), state -
+    функция (etag, last_modified) от них, по умолчанию feed_state.
+    И source, и state считаются один раз на запрос, а view получает
+    готовый queryset вместо аргументов URL.
+    """
+    def get_source(request, **kwargs):
+        if not hasattr(request, '_feed_source'):
+            request._feed_source = source(request, **kwargs)
+        return request._feed_source
+
+    def get_state(request, **kwargs):
+        if not hasattr(request, '_feed_state'):
+            request._feed_state = (state or feed_state)(
+                *get_source(request, **kwargs))
+        return request._feed_state
+
+    def decorator(view):
+        @wraps(view)
+        @require_safe
+        @cache_control(private=True, no_cache=True)
+        @condition(
+            etag_func=lambda request, **kwargs: get_state(
+                request, **kwargs)[0],
+            last_modified_func=lambda request, **kwargs: get_state(
+                request, **kwargs)[1],
+        )
+        def wrapper(request, *args, **kwargs):
+            return view(request, get_source(request, **kwargs)[0])
+        return wrapper
+    return decorator
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def feed_response(context):
+    page_obj = context['page_obj']
+    return JsonResponse({
+        'results': [serialize_post(post) for post in page_obj],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    })
+
+
+def _index_source(request):
+    return Post.objects.all(), cache.INDEX_SCOPE
+
+
+def _group_source(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return group.post.all(), cache.group_scope(group.pk)
+
+
+def _profile_source(request, username):
+    author = get_object_or_404(User, username=username)
+    return author.post.all(), cache.profile_scope(author.pk)
+
+
+def _follow_source(request):
+    return request.user, None
+
+
+@replica_reads
+@conditional_feed(_index_source)
+def index(request, posts):
+    return feed_response(get_cursor_pag(
+        posts.select_related('author', 'group'), request))
+
+
+@replica_reads
+@conditional_feed(_group_source)
+def group_posts(request, posts):
+    return feed_response(get_cursor_pag(
+        posts.select_related('author', 'group'), request))
+
+
+@replica_reads
+@conditional_feed(_profile_source)
+def profile(request, posts):
+    return feed_response(get_cursor_pag(
+        posts.select_related('author', 'group'), request))
+
+
+@login_required
+@conditional_feed(_follow_source,
+                  state=lambda user, scope: follow_feed_state(user))
+def follow_index(request, user):
+    response = feed_response(feed.get_feed_pag(user, request))
+    # Лента могла собраться только сейчас: валидаторы - по собранной.
+    etag, last_modified = follow_feed_state(user)
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+@login_required
+@require_safe
+@cache_control(private=True, no_cache=True)
+def unread_notifications(request):
+    """Число непрочитанных уведомлений из счётчика, без COUNT(*)"""
+    return JsonResponse(
+        {'unread': notifications.unread_count(request.user)})
@@ -0,0 +1,71 @@
+"""Области кэша фрагментов лент и страниц для анонимов.
+
+Ключ фрагмента (тег fragment из core) или страницы включает версию
+области (главная, группа, профиль, пост). Сигналы Post и Comment
+меняют версию через core.cache.bump, и все страницы области сразу
+перестают совпадать со старыми ключами, поэтому TTL можно держать длинным.
+"""
+from django.conf import settings
+
+from core import cache
+
+from .models import Group, Post, User
+
+INDEX_SCOPE = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def invalidate(*scopes):
+    cache.bump(*scopes)
+
+
+def post_scopes(post, *group_ids):
+    scopes = [INDEX_SCOPE, profile_scope(post.author_id),
+              post_scope(post.pk)]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.append(group_scope(group_id))
+    return scopes
+
+
+def fragment_context(scope):
+    return {
+        'cache_scope': scope,
+        'cache_ttl': getattr(settings, 'FEED_CACHE_TTL', 60 * 60),
+    }
+
+
+def index_page_scopes(request):
+    return [INDEX_SCOPE]
+
+
+def group_page_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [group_scope(group_id)]
+
+
+def profile_page_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if author_id is None else [profile_scope(author_id)]
+
+
+def post_page_scopes(request, post_id):
+    # Счётчик постов автора на странице меняется с его профилем.
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [post_scope(post_id), profile_scope(author_id)]
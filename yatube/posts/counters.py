@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import (Comment, Follow, Group, Notification, Post, User,
+                     UserStats)
+
+
+def _shift(queryset, field, delta):
+    if delta < 0:
+        # Не уводим счётчик в минус, если он уже разошёлся с данными.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def ensure_user_stats(user_id):
+    # Строки ещё нет: заводим её сразу с честными значениями.
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id,
+                   posts_count=Post.objects.filter(
+                       author_id=user_id).count(),
+                   followers_count=Follow.objects.filter(
+                       author_id=user_id).count())],
+        ignore_conflicts=True
+    )
+
+
+def change_user_posts_count(user_id, delta):
+    updated = _shift(UserStats.objects.filter(user_id=user_id),
+                     'posts_count', delta)
+    if not updated and delta > 0:
+        ensure_user_stats(user_id)
+
+
+def change_followers_count(author_id, delta):
+    updated = _shift(UserStats.objects.filter(user_id=author_id),
+                     'followers_count', delta)
+    if not updated and delta > 0:
+        ensure_user_stats(author_id)
+
+
+def change_group_posts_count(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post_comments_count(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def change_unread_notifications(user_id, delta):
+    _shift(UserStats.objects.filter(user_id=user_id),
+           'unread_notifications', delta)
+
+
+def add_unread_notifications(user_ids):
+    """+1 к непрочитанным у пачки пользователей одним UPDATE"""
+    updated = _shift(UserStats.objects.filter(user_id__in=user_ids),
+                     'unread_notifications', 1)
+    if updated == len(user_ids):
+        return
+    existing = set(UserStats.objects.filter(
+        user_id__in=user_ids).values_list('user_id', flat=True))
+    missing = [pk for pk in user_ids if pk not in existing]
+    posts_counts = dict(Post.objects.filter(author_id__in=missing).order_by()
+                        .values_list('author_id').annotate(Count('pk')))
+    followers_counts = dict(
+        Follow.objects.filter(author_id__in=missing).order_by()
+        .values_list('author_id').annotate(Count('pk')))
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk, posts_count=posts_counts.get(pk, 0),
+                   followers_count=followers_counts.get(pk, 0),
+                   unread_notifications=1)
+         for pk in missing],
+        ignore_conflicts=True
+    )
+
+
+def _count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики с нуля одним набором UPDATE"""
+    with transaction.atomic():
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk)
+             for pk in User.objects.filter(stats__isnull=True)
+             .values_list('pk', flat=True)],
+            ignore_conflicts=True
+        )
+        UserStats.objects.update(
+            posts_count=_count_subquery(Post.objects.all(), 'author'),
+            followers_count=_count_subquery(Follow.objects.all(), 'author'),
+            unread_notifications=_count_subquery(
+                Notification.objects.filter(read=False), 'user')
+        )
+        Group.objects.update(
+            posts_count=_count_subquery(Post.objects.all(), 'group')
+        )
+        Post.objects.update(
+            comments_count=_count_subquery(Comment.objects.all(), 'post')
+        )
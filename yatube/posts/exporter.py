@@ -0,0 +1,71 @@
+"""Потоковая выгрузка постов, комментариев и подписок для аналитики.
+
+Строки читаются через iterator(chunk_size) без кэша QuerySet (на
+PostgreSQL - серверным курсором) и сразу пишутся в файл, поэтому
+память не растёт с размером таблицы. since отбирает строки,
+созданные или изменённые после указанного момента; удаления в
+выгрузку не попадают.
+"""
+import csv
+import datetime
+import gzip
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+
+# Таблица -> (QuerySet, поля, поле даты изменения для since).
+EXPORTS = {
+    'posts': (Post.objects.all(),
+              ('id', 'author_id', 'group_id', 'text', 'image',
+               'comments_count', 'pub_date', 'updated'),
+              'updated'),
+    'comments': (Comment.objects.all(),
+                 ('id', 'post_id', 'author_id', 'text', 'created'),
+                 'created'),
+    'follows': (Follow.objects.all(),
+                ('id', 'user_id', 'author_id', 'created'),
+                'created'),
+}
+
+
+def export_rows(name, since=None, chunk_size=CHUNK_SIZE):
+    queryset, fields, changed = EXPORTS[name]
+    if since is not None:
+        queryset = queryset.filter(**{f'{changed}__gt': since})
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=chunk_size)
+
+
+def open_output(path, compress=False):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def write_rows(stream, name, rows, fmt='jsonl'):
+    """Пишет строки по одной, возвращает их число"""
+    fields = EXPORTS[name][1]
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([_cell(value) for value in row])
+            count += 1
+        return count
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        stream.write(encoder.encode(dict(zip(fields, row))))
+        stream.write('\n')
+        count += 1
+    return count
@@ -0,0 +1,179 @@
+"""Лента подписок с разносом постов при записи (fan-out-on-write).
+
+Каждому подписчику пишется FeedEntry, и follow_index читает готовый
+упорядоченный срез по индексу (user, pub_date, post). Для авторов,
+у которых подписчиков больше FEED_FANOUT_LIMIT, разнос не делается:
+их посты подмешиваются при чтении (fan-out-on-read).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from . import counters
+from .models import FeedEntry, Follow, Post, UserStats
+from .utils import POSTS_PER_PAGE, CursorPaginator
+
+FEED_BATCH_SIZE = 500
+
+
+def get_fanout_limit():
+    return getattr(settings, 'FEED_FANOUT_LIMIT', 1000)
+
+
+def _insert_entries(rows):
+    """rows - итератор (user_id, post_id, author_id, pub_date)"""
+    batch = []
+    for user_id, post_id, author_id, pub_date in rows:
+        batch.append(FeedEntry(user_id=user_id, post_id=post_id,
+                               author_id=author_id, pub_date=pub_date))
+        if len(batch) >= FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_fanout_on_read(author_id):
+    return UserStats.objects.filter(user_id=author_id,
+                                    fanout_on_read=True).exists()
+
+
+def fan_out_post(post):
+    """Разносит новый пост по лентам подписчиков автора"""
+    stats = UserStats.objects.filter(user_id=post.author_id).values_list(
+        'fanout_on_read', 'followers_count').first()
+    fanout_on_read, followers_count = stats or (False, 0)
+    if fanout_on_read:
+        return
+    # Число подписчиков - из счётчика, без COUNT на каждый пост.
+    if followers_count > get_fanout_limit():
+        # Флаг не снимается сам: посты, которые уже читаются на лету,
+        # не попали в ленты. Вернуть автора в разнос - rebuild_feeds.
+        UserStats.objects.filter(user_id=post.author_id).update(
+            fanout_on_read=True)
+        return
+    _insert_entries(
+        (user_id, post.pk, post.author_id, post.pub_date)
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id).values_list('user_id',
+                                                  flat=True).iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """Разносит пачку постов (pk, author_id, pub_date) по собранным лентам.
+
+    Для импорта: не собранные ленты возьмут посты сами в ensure_feed.
+    """
+    by_author = defaultdict(list)
+    for pk, author_id, pub_date in posts:
+        by_author[author_id].append((pk, pub_date))
+    UserStats.objects.filter(
+        user_id__in=by_author, followers_count__gt=get_fanout_limit()
+    ).update(fanout_on_read=True)
+    followers = Follow.objects.filter(
+        author_id__in=by_author, user__stats__feed_built=True
+    ).exclude(author__stats__fanout_on_read=True).values_list(
+        'user_id', 'author_id')
+    _insert_entries(
+        (user_id, pk, author_id, pub_date)
+        for user_id, author_id in followers.iterator()
+        for pk, pub_date in by_author[author_id]
+    )
+
+
+def follow(user_id, author_id):
+    """Подписка: добавляет посты автора в уже собранную ленту"""
+    feed_built = UserStats.objects.filter(user_id=user_id,
+                                          feed_built=True).exists()
+    if not feed_built or is_fanout_on_read(author_id):
+        return
+    _insert_entries(
+        (user_id, pk, author_id, pub_date)
+        for pk, pub_date in Post.objects.filter(
+            author_id=author_id).values_list('pk', 'pub_date').iterator()
+    )
+
+
+def unfollow(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def ensure_feed(user):
+    """Собирает ленту при первом чтении.
+
+    Подписки, созданные в обход сигналов (bulk_create), попадают в ленту
+    именно здесь.
+    """
+    if UserStats.objects.filter(user=user, feed_built=True).exists():
+        return
+    with transaction.atomic():
+        posts = Post.objects.filter(author__following__user=user).exclude(
+            author__stats__fanout_on_read=True)
+        _insert_entries(
+            (user.pk, pk, author_id, pub_date)
+            for pk, author_id, pub_date in posts.values_list(
+                'pk', 'author_id', 'pub_date').iterator()
+        )
+        counters.ensure_user_stats(user.pk)
+        UserStats.objects.filter(user=user).update(feed_built=True)
+
+
+def rebuild_feeds():
+    """Пересчитывает флаги разноса и сбрасывает все ленты"""
+    limit = get_fanout_limit()
+    with transaction.atomic():
+        UserStats.objects.update(fanout_on_read=False, feed_built=False)
+        celebrities = list(Follow.objects.values('author').annotate(
+            total=Count('pk')).filter(total__gt=limit).values_list(
+            'author', flat=True))
+        for author_id in celebrities:
+            counters.ensure_user_stats(author_id)
+        UserStats.objects.filter(user_id__in=celebrities).update(
+            fanout_on_read=True)
+        FeedEntry.objects.all().delete()
+
+
+class FeedPaginator(CursorPaginator):
+    """Сливает готовую ленту с постами авторов, читаемых на лету"""
+
+    def __init__(self, user, per_page=POSTS_PER_PAGE):
+        super().__init__(Post.objects.select_related('author', 'group'),
+                         per_page)
+        self.user = user
+
+    def _sources(self):
+        entries = FeedEntry.objects.filter(user=self.user).values_list(
+            'pub_date', 'post_id')
+        sources = [CursorPaginator(entries, self.per_page,
+                                   tiebreaker='post_id')]
+        authors = list(Follow.objects.filter(
+            user=self.user, author__stats__fanout_on_read=True
+        ).values_list('author_id', flat=True))
+        if authors:
+            posts = Post.objects.filter(author_id__in=authors).values_list(
+                'pub_date', 'pk')
+            sources.append(CursorPaginator(posts, self.per_page))
+        return sources
+
+    def _fetch(self, cursor, forward):
+        keys = set()
+        for source in self._sources():
+            keys.update(source._fetch(cursor, forward))
+        keys = sorted(keys, reverse=not forward)[:self.per_page + 1]
+        posts = self.object_list.in_bulk([pk for _, pk in keys])
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+
+def get_feed_pag(user, request):
+    ensure_feed(user)
+    paginator = FeedPaginator(user)
+    page_obj = paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    return {
+        'paginator': paginator,
+        'cursor_mode': True,
+        'page_obj': page_obj
+    }
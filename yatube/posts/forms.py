@@ -1,13 +1,27 @@
 from django import forms
 
+from .images import check_upload, normalize_upload
 from .models import Post, Comment
 
 
+class PostImageField(forms.ImageField):
+    """Картинка поста: проверка до декодирования и пережатие"""
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        check_upload(data)
+        return normalize_upload(super().to_python(data))
+
+
 class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {
+            'image': PostImageField,
+        }
         help_texts = {
             'text': 'Введите текст',
             'group': 'Выберите группу',
@@ -0,0 +1,146 @@
+"""Картинки постов: приём загрузок и миниатюры.
+
+Загрузка проверяется по размеру и заголовку файла до декодирования,
+затем пережимается до ограниченного размера без метаданных.
+Варианты размеров готовит задача очереди core.jobs: она отмечает пост
+флагом thumbnails_ready и сбрасывает кэш его страниц. До этого шаблоны
+показывают оригинал и не запускают генерацию в запросе.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from core.jobs import job
+
+from . import cache
+from .models import Post
+
+THUMBNAIL_SIZES = ('960x339', '760x259')
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def post_image(post, size):
+    """Миниатюра, если задача уже её сделала, иначе оригинал картинки"""
+    if not post.thumbnails_ready:
+        return post.image
+    return get_thumbnail(post.image, size, **THUMBNAIL_OPTIONS)
+
+
+@job()
+def generate_thumbnails(name):
+    for size in THUMBNAIL_SIZES:
+        get_thumbnail(name, size, **THUMBNAIL_OPTIONS)
+    posts = list(Post.objects.filter(image=name))
+    Post.objects.filter(image=name).update(thumbnails_ready=True)
+    # Страницы, закэшированные с оригиналом, пересобираются с миниатюрой.
+    for post in posts:
+        cache.invalidate(*cache.post_scopes(post))
+
+
+def schedule_thumbnails(post):
+    """Ставит генерацию миниатюр в очередь вместе с сохранением поста"""
+    if post.image and not post.thumbnails_ready:
+        generate_thumbnails.delay(name=post.image.name)
+
+
+# Сигнатуры в первых байтах файла: формат определяется без декодирования.
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+OUTPUT_FORMATS = {'JPEG': 'JPEG', 'PNG': 'PNG', 'GIF': 'PNG', 'WEBP': 'WEBP'}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def get_max_bytes():
+    return getattr(settings, 'POST_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше лимита.
+
+    Остаток только считается: file.size остаётся честным, и форма
+    отклонит файл, не дочитывая его на диск.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.written = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.written + len(raw_data) <= get_max_bytes():
+            self.file.write(raw_data)
+            self.written += len(raw_data)
+
+
+def detect_format(upload):
+    upload.seek(0)
+    header = upload.read(16)
+    upload.seek(0)
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, image_format in SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def check_upload(upload):
+    """Проверки до декодирования: размер в байтах и заголовок"""
+    max_bytes = get_max_bytes()
+    if upload.size > max_bytes:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': max_bytes // (1024 * 1024)},
+        )
+    if detect_format(upload) is None:
+        raise ValidationError(
+            'Поддерживаются только JPEG, PNG, GIF и WEBP.',
+            code='invalid_image_format',
+        )
+
+
+def normalize_upload(upload):
+    """Пережимает картинку до POST_IMAGE_MAX_SIDE и убирает метаданные"""
+    max_side = getattr(settings, 'POST_IMAGE_MAX_SIDE', 1920)
+    max_pixels = getattr(settings, 'POST_IMAGE_MAX_PIXELS', 40_000_000)
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ValidationError('Слишком большое разрешение картинки.',
+                              code='image_too_large')
+    source_format = detect_format(upload)
+    output_format = OUTPUT_FORMATS[source_format]
+    if source_format == 'JPEG':
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if output_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode == 'P':
+        image = image.convert('RGBA')
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    # Без exif и pnginfo метаданные исходника не попадают в файл.
+    image.save(output, output_format, optimize=True,
+               **({'quality': 85} if output_format != 'PNG' else {}))
+    size = output.tell()
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return UploadedFile(
+        file=output,
+        name=f'{name}.{EXTENSIONS[output_format]}',
+        content_type=Image.MIME[output_format],
+        size=size,
+    )
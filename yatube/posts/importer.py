@@ -0,0 +1,176 @@
+"""Потоковый импорт постов из JSONL или CSV.
+
+Запись - author (username), text и необязательные pub_date (ISO 8601)
+и group (slug). Файл читается построчно, посты вставляются пачками
+через bulk_create. Каждая пачка - одна транзакция вместе со счётчиками,
+лентами подписок и поисковым индексом, поэтому после сбоя в базе
+остаются только целые пачки, и импорт можно продолжить с номера
+записи, на котором он остановился.
+"""
+import csv
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, feed, search
+from .models import Group, Post, User
+from .utils import bulk_create_posts
+
+BATCH_SIZE = 1000
+FORMATS = ('jsonl', 'csv')
+
+
+class ImportRecordError(ValueError):
+    def __init__(self, number, message):
+        super().__init__(f'Запись {number}: {message}')
+        self.number = number
+
+
+def read_records(stream, fmt='jsonl'):
+    """Записи из файла по одной, без чтения файла целиком"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    number = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        number += 1
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise ImportRecordError(number, f'неверный JSON ({error})')
+
+
+class Lookup:
+    """Таблица ключ -> pk в памяти, промахи добираются одним запросом"""
+
+    def __init__(self, model, field, factory=None):
+        self.model = model
+        self.field = field
+        self.factory = factory
+        self.ids = {}
+
+    def resolve(self, keys):
+        missing = {key for key in keys if key not in self.ids}
+        if missing:
+            self._load(missing)
+        missing -= self.ids.keys()
+        if missing and self.factory is not None:
+            self.model.objects.bulk_create(
+                [self.factory(key) for key in missing],
+                ignore_conflicts=True
+            )
+            self._load(missing)
+        return missing - self.ids.keys()
+
+    def _load(self, keys):
+        self.ids.update(self.model.objects.filter(
+            **{f'{self.field}__in': keys}).values_list(self.field, 'pk'))
+
+    def __getitem__(self, key):
+        return self.ids[key]
+
+
+def _new_author(username):
+    return User(username=username, password=make_password(None))
+
+
+def _new_group(slug):
+    return Group(title=slug, slug=slug, description='')
+
+
+def _pub_date(value, number):
+    if not value:
+        return timezone.now()
+    pub_date = parse_datetime(value)
+    if pub_date is None:
+        raise ImportRecordError(number, f'неверная дата {value!r}')
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, timezone.utc)
+    return pub_date
+
+
+class PostImporter:
+    def __init__(self, batch_size=BATCH_SIZE, create_missing=False):
+        self.batch_size = batch_size
+        self.authors = Lookup(User, 'username',
+                              _new_author if create_missing else None)
+        self.groups = Lookup(Group, 'slug',
+                             _new_group if create_missing else None)
+
+    def run(self, records, skip=0, on_batch=None):
+        """Импортирует записи после первых skip.
+
+        on_batch(done) вызывается после коммита каждой пачки, done -
+        номер последней записи в ней. Возвращает число новых постов.
+        """
+        imported = 0
+        batch = []
+        for number, record in enumerate(records, 1):
+            if number <= skip:
+                continue
+            batch.append((number, record))
+            if len(batch) >= self.batch_size:
+                imported += self.insert(batch)
+                if on_batch:
+                    on_batch(number)
+                batch = []
+        if batch:
+            imported += self.insert(batch)
+            if on_batch:
+                on_batch(batch[-1][0])
+        return imported
+
+    def _check(self, batch):
+        for number, record in batch:
+            if not record.get('author') or not record.get('text'):
+                raise ImportRecordError(number, 'нужны author и text')
+        for lookup, name in ((self.authors, 'author'),
+                             (self.groups, 'group')):
+            unknown = lookup.resolve({record[name] for _, record in batch
+                                      if record.get(name)})
+            for number, record in batch:
+                if record.get(name) in unknown:
+                    raise ImportRecordError(
+                        number, f'неизвестный {name} {record[name]!r}')
+
+    def _build(self, batch):
+        return [
+            Post(author_id=self.authors[record['author']],
+                 group_id=(self.groups[record['group']]
+                           if record.get('group') else None),
+                 text=record['text'],
+                 pub_date=_pub_date(record.get('pub_date'), number))
+            for number, record in batch
+        ]
+
+    def insert(self, batch):
+        self._check(batch)
+        posts = self._build(batch)
+        with transaction.atomic():
+            rows = [(post.pk, post.author_id, post.group_id, post.pub_date)
+                    for post in bulk_create_posts(posts)]
+            self._update_derived(rows)
+        cache.invalidate(cache.INDEX_SCOPE, *{
+            scope for _, author_id, group_id, _ in rows
+            for scope in (cache.profile_scope(author_id),
+                          group_id and cache.group_scope(group_id))
+            if scope
+        })
+        return len(rows)
+
+    def _update_derived(self, rows):
+        """Счётчики, ленты и поиск, которые bulk_create обходит"""
+        for author_id, total in Counter(row[1] for row in rows).items():
+            counters.change_user_posts_count(author_id, total)
+        for group_id, total in Counter(row[2] for row in rows).items():
+            counters.change_group_posts_count(group_id, total)
+        feed.fan_out_posts((pk, author_id, pub_date)
+                           for pk, author_id, _, pub_date in rows)
+        search.index_posts(row[0] for row in rows)
@@ -0,0 +1,130 @@
+import json
+import platform
+import random
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.bench import compare_reports, measure_queries, summarize, \
+    test_database
+from posts.models import Group, Post, User
+from posts.search import index_posts
+from posts.seed import faker_texts, seed
+
+
+def scenarios(client, rng):
+    """Название -> функция одного запроса к view"""
+    reader = User.objects.annotate(
+        total=Count('follower')).order_by('-total').first()
+    author = User.objects.order_by('-stats__posts_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    client.force_login(reader)
+    words = Post.objects.values_list('text', flat=True)[:50]
+    terms = [text.split()[0] for text in words if text]
+
+    def get(url, **params):
+        return lambda: client.get(url, params)
+
+    return {
+        'index': get(reverse('posts:index')),
+        'index_page_100': get(reverse('posts:index'), page=100),
+        'group_posts': get(reverse('posts:groups',
+                                   kwargs={'slug': group.slug})),
+        'profile': get(reverse('posts:profile',
+                               kwargs={'username': author.username})),
+        'post_detail': get(reverse('posts:post_detail',
+                                   kwargs={'post_id': post.pk})),
+        'follow_index': get(reverse('posts:follow_index')),
+        'search': lambda: client.get(reverse('posts:search'),
+                                     {'q': rng.choice(terms)}),
+        'post_create': lambda: client.post(reverse('posts:create'),
+                                           {'text': 'Замер создания поста'}),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер view приложения posts на сгенерированных '
+            'данных: p50/p95/p99 и число запросов, отчёт в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора, чтобы данные '
+                                 'совпадали между прогонами')
+        parser.add_argument('--only', nargs='+', metavar='VIEW',
+                            help='Замерить только эти сценарии')
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда сохранить отчёт')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='Сравнить с прошлым отчётом и завершиться '
+                                 'с ошибкой при регрессии')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='Допустимое ухудшение p95, в процентах')
+
+    def run_scenarios(self, options):
+        rng = random.Random(options['seed'])
+        self.stdout.write('Заполняем тестовую БД...')
+        seed(users=options['users'], posts=options['posts'],
+             groups=options['groups'], follows=options['follows'],
+             comments=options['comments'], rng=rng,
+             texts=faker_texts(rng=rng))
+        index_posts(Post.objects.values_list('pk', flat=True).iterator())
+        results = {}
+        for name, request in scenarios(Client(), rng).items():
+            if options['only'] and name not in options['only']:
+                continue
+            cache.clear()
+            # Первый запрос - холодный: пустой кэш, несобранная лента.
+            cold, _ = measure_queries(request, 1)
+            timings, queries = measure_queries(request, options['repeat'])
+            results[name] = summarize(timings, queries)
+            results[name]['cold_ms'] = round(cold[0], 3)
+            self.stdout.write(
+                f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                f'p95 {results[name]["p95_ms"]} мс, '
+                f'p99 {results[name]["p99_ms"]} мс, '
+                f'запросов {results[name]["queries"]}')
+        return results
+
+    def handle(self, *args, **options):
+        # Лимиты записи оборвали бы post_create на 429 после десятка.
+        with test_database(), override_settings(RATE_LIMITS={}):
+            views = self.run_scenarios(options)
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'options': {key: options[key] for key in (
+                    'users', 'posts', 'groups', 'follows', 'comments',
+                    'repeat', 'seed')},
+            },
+            'views': views,
+        }
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            regressions = compare_reports(baseline['views'], views,
+                                          options['threshold'])
+            for name, message in regressions:
+                self.stdout.write(self.style.ERROR(f'{name}: {message}'))
+            if regressions:
+                raise CommandError('Есть регрессии относительно '
+                                   f'{options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,100 @@
+import json
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from core.bench import measure, percentile, test_database
+from posts.models import Comment, Group, Post, User
+from posts.seed import seed
+from posts.utils import POSTS_PER_PAGE
+
+# Уникальный индекс подписок (user, author) - ограничение, а не
+# оптимизация: без него проверка подписки не сравнивается, поэтому её
+# здесь нет.
+FEED_INDEXES = {
+    Post: [index.name for index in Post._meta.indexes],
+    Comment: [index.name for index in Comment._meta.indexes],
+}
+
+
+@contextmanager
+def without_feed_indexes():
+    """Временно удаляет составные индексы; DDL в SQLite откатывается"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for names in FEED_INDEXES.values():
+                for name in names:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(name)}')
+        yield
+        transaction.set_rollback(True)
+
+
+def feed_querysets():
+    posts = Post.objects.select_related('author', 'group').order_by(
+        'pub_date', 'pk')
+    group = Group.objects.order_by('-posts_count').first()
+    author = User.objects.order_by('-stats__posts_count').first()
+    reader = User.objects.annotate(
+        total=Count('follower')).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count').first()
+    return {
+        'index': posts[:POSTS_PER_PAGE],
+        'group_posts': posts.filter(group=group)[:POSTS_PER_PAGE],
+        'profile': posts.filter(author=author)[:POSTS_PER_PAGE],
+        'follow_index': posts.filter(
+            author__following__user=reader)[:POSTS_PER_PAGE],
+        'comments': Comment.objects.select_related('author').filter(
+            post=post).order_by('-created')[:POSTS_PER_PAGE],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает планы и время запросов лент '
+            'без составных индексов и с ними')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда сохранить отчёт в JSON')
+
+    def run_queries(self, repeat):
+        report = {}
+        for name, queryset in feed_querysets().items():
+            timings = measure(lambda: list(queryset.all()), repeat)
+            report[name] = {
+                'plan': queryset.explain(),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+            }
+        return report
+
+    def handle(self, *args, **options):
+        with test_database():
+            self.stdout.write('Заполняем тестовую БД...')
+            seed(users=options['users'], posts=options['posts'],
+                 groups=options['groups'], follows=options['follows'],
+                 comments=options['comments'])
+            with without_feed_indexes():
+                before = self.run_queries(options['repeat'])
+            after = self.run_queries(options['repeat'])
+        for name in after:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, result in (('без индексов', before[name]),
+                                  ('с индексами', after[name])):
+                self.stdout.write(
+                    f'  {label}: p50 {result["p50_ms"]} мс, '
+                    f'p95 {result["p95_ms"]} мс')
+                for line in result['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump({'before': before, 'after': after}, file,
+                          ensure_ascii=False, indent=2)
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.exporter import (CHUNK_SIZE, EXPORTS, FORMATS, export_rows,
+                            open_output, write_rows)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии и подписки в JSONL или CSV '
+            'потоком, без загрузки таблиц в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='*',
+                            help=f'Из {", ".join(EXPORTS)}; '
+                                 f'по умолчанию - все')
+        parser.add_argument('--output-dir', default='.')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--since',
+                            help='Только строки, созданные или изменённые '
+                                 'позже этого момента (ISO 8601)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        unknown = set(options['tables']) - EXPORTS.keys()
+        if unknown:
+            raise CommandError(f'Неизвестные таблицы: {", ".join(unknown)}')
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'Неверная дата: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, timezone.utc)
+        extension = options['format'] + ('.gz' if options['gzip'] else '')
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for name in options['tables'] or EXPORTS:
+            path = os.path.join(options['output_dir'],
+                                f'{name}.{extension}')
+            started = time.monotonic()
+            rows = export_rows(name, since=since,
+                               chunk_size=options['chunk_size'])
+            with open_output(path, compress=options['gzip']) as stream:
+                count = write_rows(stream, name, rows, options['format'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {count} строк в {path} '
+                f'за {time.monotonic() - started:.1f} с'))
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import (BATCH_SIZE, FORMATS, ImportRecordError,
+                            PostImporter, read_records)
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSONL или CSV пачками; после сбоя '
+            'продолжает с контрольной точки (--resume)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию - по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Заводить неизвестных авторов и группы')
+        parser.add_argument('--checkpoint',
+                            help='Файл контрольной точки, '
+                                 'по умолчанию <path>.checkpoint')
+        parser.add_argument('--resume', action='store_true',
+                            help='Пропустить записи до контрольной точки')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or (
+            None if path == '-' else f'{path}.checkpoint')
+        if options['resume'] and not checkpoint:
+            raise CommandError('Для --resume из stdin нужен --checkpoint')
+        skip = self.read_checkpoint(checkpoint) if options['resume'] else 0
+
+        importer = PostImporter(batch_size=options['batch_size'],
+                                create_missing=options['create_missing'])
+        started = time.monotonic()
+
+        def on_batch(done):
+            if checkpoint:
+                self.write_checkpoint(checkpoint, done)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Записей обработано: {done}, '
+                                  f'{self.rate(done - skip, started)}')
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8',
+                                                    newline='')
+        try:
+            imported = importer.run(read_records(stream, fmt),
+                                    skip=skip, on_batch=on_batch)
+        except ImportRecordError as error:
+            raise CommandError(f'{error}. Исправьте запись и запустите '
+                               f'импорт с --resume')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {imported}, '
+            f'{self.rate(imported, started)}'))
+
+    @staticmethod
+    def rate(count, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        return f'{elapsed:.1f} с, {count / elapsed:.0f} постов/с'
+
+    @staticmethod
+    def read_checkpoint(path):
+        try:
+            with open(path) as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def write_checkpoint(path, done):
+        # Через временный файл, чтобы сбой не оставил половину числа.
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            file.write(str(done))
+        os.replace(temporary, path)
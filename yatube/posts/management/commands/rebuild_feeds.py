@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает авторов, читаемых на лету, и сбрасывает ленты '
+            'подписок: они соберутся заново при следующем чтении')
+
+    def handle(self, *args, **options):
+        rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS('Ленты сброшены'))
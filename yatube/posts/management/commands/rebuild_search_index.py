@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import index_posts
+
+
+class Command(BaseCommand):
+    help = 'Переиндексирует все посты для поиска'
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.values_list('pk', flat=True).iterator()
+        index_posts(post_ids)
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс обновлён'))
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def fill_followers_count(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    missing = Follow.objects.exclude(
+        author__stats__isnull=False).values('author').distinct()
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=row['author']) for row in missing.iterator()],
+        batch_size=500, ignore_conflicts=True)
+    # Новым строкам - честное число постов; у старых с нулём оно то же.
+    UserStats.objects.filter(posts_count=0).update(
+        posts_count=count_subquery(Post, 'author'))
+    UserStats.objects.update(
+        followers_count=count_subquery(Follow, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+import json
+
+from django.db import migrations
+
+# Имя задачи posts.images.generate_thumbnails: миграция не импортирует
+# код приложения, он может измениться.
+JOB_NAME = 'posts.images.generate_thumbnails'
+BATCH_SIZE = 500
+
+
+def schedule_thumbnails(apps, schema_editor):
+    """Ставит миниатюры картинкам, загруженным до флага thumbnails_ready.
+
+    Без этого такие посты навсегда показывают оригинал. Задачи выполнит
+    воркер run_jobs.
+    """
+    Post = apps.get_model('posts', 'Post')
+    Job = apps.get_model('core', 'Job')
+    names = Post.objects.filter(thumbnails_ready=False).exclude(
+        image='').order_by().values_list('image', flat=True).distinct()
+    batch = []
+    for name in names.iterator():
+        batch.append(Job(name=JOB_NAME, payload=json.dumps({'name': name})))
+        if len(batch) >= BATCH_SIZE:
+            Job.objects.bulk_create(batch)
+            batch = []
+    Job.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('posts', '0018_followers_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_thumbnails, migrations.RunPython.noop),
+    ]
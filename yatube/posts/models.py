@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, router
+from django.db.models import F
+from django.db.models.signals import post_save
 
 from django.contrib.auth import get_user_model
 
@@ -11,11 +13,18 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название')
     slug = models.SlugField(verbose_name='Адрес', unique=True)
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(default=0,
+                                              editable=False,
+                                              verbose_name='Число постов')
 
     def __str__(self):
         return self.title
 
 
+class PostEditConflict(Exception):
+    """Пост изменили после того, как его открыли на редактирование"""
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Тело поста')
     pub_date = models.DateTimeField(auto_now_add=True,
@@ -32,14 +41,62 @@ class Post(models.Model):
     image = models.ImageField(verbose_name='Картнка',
                               upload_to='posts/',
                               blank=True)
+    thumbnails_ready = models.BooleanField(default=False,
+                                           editable=False,
+                                           verbose_name='Миниатюры готовы')
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
+    updated = models.DateTimeField(auto_now=True,
+                                   verbose_name='Дата изменения')
+    version = models.PositiveIntegerField(default=1,
+                                          editable=False,
+                                          verbose_name='Версия')
+
+    UNCHECKED_FIELDS = ('id', 'author', 'pub_date', 'comments_count',
+                        'version')
 
     def __str__(self):
         return self.text[:15]
 
+    def save_checked(self, version):
+        """Сохраняет пост, только если в базе всё ещё версия version.
+
+        Проверка и запись - один UPDATE ... WHERE version = %s, без
+        блокировок. Если пост успели изменить, бросает PostEditConflict.
+        Счётчики, дата публикации и автор не пишутся: их меняют только
+        свои пути. post_save отправляется вручную, чтобы сигналы
+        сбросили кэш и переиндексировали пост.
+        """
+        values = {
+            field.attname: field.pre_save(self, False)
+            for field in self._meta.concrete_fields
+            if field.name not in self.UNCHECKED_FIELDS
+        }
+        using = router.db_for_write(Post, instance=self)
+        updated = Post.objects.using(using).filter(
+            pk=self.pk, version=version).update(
+            version=F('version') + 1, **values)
+        if not updated:
+            raise PostEditConflict
+        self.version = version + 1
+        post_save.send(sender=Post, instance=self, created=False,
+                       update_fields=None, raw=False, using=using)
+
     class Meta:
         ordering = ('pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['updated'], name='post_updated_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -60,12 +117,17 @@ class Comment(models.Model):
         ordering = ["-created"]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['created'], name='comment_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class Follow(CreateModel):
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
                              verbose_name='Фолловер',
@@ -80,7 +142,143 @@ class Follow(models.Model):
     class Meta:
         verbose_name = "Подписаться на автора"
         verbose_name_plural = "Подписки"
-        models.UniqueConstraint(fields=["user", "author"], name="following")
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="following"),
+        ]
+        indexes = [
+            models.Index(fields=['created'], name='follow_created_idx'),
+        ]
 
     def __str__(self):
         return f"Подписка {self.user} на {self.author}"
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживают сигналы posts.signals"""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',
+                                verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='Число постов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+    fanout_on_read = models.BooleanField(
+        default=False,
+        verbose_name='Лента подписчиков читается на лету'
+    )
+    feed_built = models.BooleanField(default=False,
+                                     verbose_name='Лента собрана')
+    unread_notifications = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Непрочитанных уведомлений'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя"""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed_entries',
+                             verbose_name='Читатель')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='feed_entries',
+                             verbose_name='Пост')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор')
+    pub_date = models.DateTimeField(verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='feed_entry_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class Notification(CreateModel):
+    """Уведомление, которое пишут задачи posts.notifications"""
+    NEW_POST = 'post'
+    NEW_COMMENT = 'comment'
+    NEW_FOLLOWER = 'follow'
+    KINDS = (
+        (NEW_POST, 'Новый пост'),
+        (NEW_COMMENT, 'Новый комментарий'),
+        (NEW_FOLLOWER, 'Новый подписчик'),
+    )
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='notifications',
+                             verbose_name='Получатель')
+    actor = models.ForeignKey(User,
+                              on_delete=models.CASCADE,
+                              related_name='+',
+                              verbose_name='Кто')
+    kind = models.CharField(max_length=10, choices=KINDS,
+                            verbose_name='Событие')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             null=True,
+                             blank=True,
+                             related_name='notifications',
+                             verbose_name='Пост')
+    read = models.BooleanField(default=False, verbose_name='Прочитано')
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(fields=['user', 'created'],
+                         name='notification_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} для {self.user}'
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс поиска, если в SQLite нет FTS5 (см. posts.search)"""
+    MAX_LENGTH = 64
+
+    term = models.CharField(max_length=MAX_LENGTH, verbose_name='Слово')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='search_terms',
+                             verbose_name='Пост')
+    weight = models.PositiveIntegerField(verbose_name='Вес')
+
+    class Meta:
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        indexes = [
+            models.Index(fields=['term', 'post'],
+                         name='search_term_post_idx'),
+        ]
+
+    def __str__(self):
+        return self.term
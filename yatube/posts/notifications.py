@@ -0,0 +1,82 @@
+"""Уведомления о постах, комментариях и подписках.
+
+Пишутся задачами очереди core.jobs, а не в запросе: у автора могут
+быть тысячи подписчиков. Подписчики обходятся пачками по user_id,
+каждая пачка - один bulk_create и один UPDATE счётчиков в своей
+транзакции. Повтор упавшей задачи продолжает с последней записанной
+пачки. Число непрочитанных хранится в UserStats.unread_notifications,
+поэтому его можно отдавать без COUNT(*).
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from core.jobs import job
+
+from . import counters
+from .models import Comment, Follow, Notification, Post, UserStats
+
+NOTIFY_BATCH_SIZE = 500
+
+
+def _notify(user_ids, actor_id, kind, post_id=None):
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            Notification(user_id=user_id, actor_id=actor_id, kind=kind,
+                         post_id=post_id)
+            for user_id in user_ids
+        )
+        counters.add_unread_notifications(user_ids)
+
+
+@job()
+def notify_followers(post_id):
+    post = Post.objects.filter(pk=post_id).values('author_id').first()
+    if post is None:
+        return
+    last_user_id = Notification.objects.filter(
+        post_id=post_id, kind=Notification.NEW_POST).aggregate(
+        last=Max('user_id'))['last'] or 0
+    followers = Follow.objects.filter(
+        author_id=post['author_id']).order_by('user_id').values_list(
+        'user_id', flat=True)
+    while True:
+        user_ids = list(followers.filter(
+            user_id__gt=last_user_id)[:NOTIFY_BATCH_SIZE])
+        if not user_ids:
+            break
+        _notify(user_ids, post['author_id'], Notification.NEW_POST,
+                post_id)
+        last_user_id = user_ids[-1]
+
+
+@job()
+def notify_comment(comment_id):
+    comment = Comment.objects.filter(pk=comment_id).values(
+        'author_id', 'post_id', 'post__author_id').first()
+    if comment is None or comment['author_id'] == comment[
+            'post__author_id']:
+        return
+    _notify([comment['post__author_id']], comment['author_id'],
+            Notification.NEW_COMMENT, comment['post_id'])
+
+
+@job()
+def notify_follow(user_id, author_id):
+    # Повторная подписка после отписки не шлёт второе уведомление.
+    if Notification.objects.filter(user_id=author_id, actor_id=user_id,
+                                   kind=Notification.NEW_FOLLOWER).exists():
+        return
+    _notify([author_id], user_id, Notification.NEW_FOLLOWER)
+
+
+def unread_count(user):
+    return UserStats.objects.filter(user=user).values_list(
+        'unread_notifications', flat=True).first() or 0
+
+
+def mark_read(user, pks):
+    """Отмечает прочитанными уведомления pks и уменьшает счётчик на столько"""
+    with transaction.atomic():
+        marked = Notification.objects.filter(
+            user=user, pk__in=pks, read=False).update(read=True)
+        counters.change_unread_notifications(user.pk, -marked)
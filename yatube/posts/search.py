@@ -0,0 +1,167 @@
+"""Полнотекстовый поиск по постам и их группам.
+
+На SQLite с FTS5 индекс живёт в виртуальной таблице posts_post_fts,
+иначе - в обратном индексе SearchTerm. Индекс обновляют сигналы
+Post и Group (posts.signals), поиск ранжирует по релевантности.
+"""
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, Sum
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+# Вес совпадений в тексте поста, названии и описании группы.
+TEXT_WEIGHT, TITLE_WEIGHT, DESCRIPTION_WEIGHT = 2, 3, 1
+INDEX_BATCH_SIZE = 500
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def _documents(post_ids):
+    return Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'text', 'group__title', 'group__description')
+
+
+class FtsBackend:
+    def replace(self, post_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, post_ids)
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, text, group_title, group_description) '
+                'VALUES (%s, %s, %s, %s)',
+                [(pk, text, title or '', description or '')
+                 for pk, text, title, description in _documents(post_ids)]
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, post_ids)
+
+    def _delete(self, cursor, post_ids):
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [(pk,) for pk in post_ids])
+
+    def _match(self, tokens):
+        return ' '.join('"{}"'.format(token) for token in tokens)
+
+    def count(self, tokens):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s', [self._match(tokens)])
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, tokens, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s), rowid DESC '
+                'LIMIT %s OFFSET %s',
+                [self._match(tokens), TEXT_WEIGHT, TITLE_WEIGHT,
+                 DESCRIPTION_WEIGHT, limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """Обратный индекс в таблице SearchTerm, когда FTS5 недоступен"""
+
+    def replace(self, post_ids):
+        self.remove(post_ids)
+        terms = []
+        for pk, text, title, description in _documents(post_ids):
+            weights = Counter()
+            for source, weight in ((text, TEXT_WEIGHT),
+                                   (title, TITLE_WEIGHT),
+                                   (description, DESCRIPTION_WEIGHT)):
+                for token in tokenize(source):
+                    weights[token[:SearchTerm.MAX_LENGTH]] += weight
+            terms.extend(SearchTerm(term=term, post_id=pk, weight=weight)
+                         for term, weight in weights.items())
+        SearchTerm.objects.bulk_create(terms, batch_size=INDEX_BATCH_SIZE)
+
+    def remove(self, post_ids):
+        SearchTerm.objects.filter(post_id__in=post_ids).delete()
+
+    def _matches(self, tokens):
+        tokens = {token[:SearchTerm.MAX_LENGTH] for token in tokens}
+        return SearchTerm.objects.filter(term__in=tokens).values(
+            'post').annotate(matched=Count('term'), score=Sum('weight')
+                             ).filter(matched=len(tokens))
+
+    def count(self, tokens):
+        return self._matches(tokens).count()
+
+    def ranked_ids(self, tokens, offset, limit):
+        return list(self._matches(tokens).order_by(
+            '-score', '-post').values_list('post', flat=True)
+            [offset:offset + limit])
+
+
+_backends = {}
+
+
+def has_fts():
+    if connection.vendor != 'sqlite':
+        return False
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    alias = connection.alias
+    if alias not in _backends:
+        _backends[alias] = FtsBackend() if has_fts() else (
+            InvertedIndexBackend())
+    return _backends[alias]
+
+
+def index_posts(post_ids):
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), INDEX_BATCH_SIZE):
+        get_backend().replace(post_ids[start:start + INDEX_BATCH_SIZE])
+
+
+def remove_posts(post_ids):
+    get_backend().remove(list(post_ids))
+
+
+class SearchResults:
+    """Ленивый ранжированный список постов для Paginator"""
+
+    def __init__(self, query):
+        self.tokens = tokenize(query)
+
+    def count(self):
+        if not self.tokens:
+            return 0
+        return get_backend().count(self.tokens)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if not self.tokens or index.stop is None or index.stop <= start:
+            return []
+        ids = get_backend().ranked_ids(self.tokens, start,
+                                       index.stop - start)
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_ids(query, limit):
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    return get_backend().ranked_ids(tokens, 0, limit)
@@ -0,0 +1,82 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .counters import rebuild_counters
+from .models import Comment, Follow, Group, Post, User
+from .utils import bulk_create_posts
+
+BATCH_SIZE = 500
+
+
+def faker_texts(count=1000, locale='ru_RU', rng=None):
+    """Набор правдоподобных текстов, из которого seed берёт случайные.
+
+    Faker на каждый из сотен тысяч постов слишком медленный, поэтому
+    тексты генерируются один раз и переиспользуются.
+    """
+    from faker import Faker
+
+    rng = rng or random.Random(0)
+    fake = Faker(locale)
+    fake.seed_instance(rng.random())
+    return [fake.paragraph(nb_sentences=rng.randint(1, 6))
+            for _ in range(count)]
+
+
+def seed(users=1000, posts=100000, groups=20, follows=20, comments=0,
+         days=365, rng=None, texts=None):
+    """Быстро заполняет БД случайными данными через bulk_create.
+
+    texts - список текстов для постов и комментариев (см. faker_texts),
+    без него тексты вида 'Пост номер N'.
+    """
+    rng = rng or random.Random(0)
+    password = make_password(None)
+    User.objects.bulk_create(
+        [User(username=f'user{number}', password=password)
+         for number in range(users)],
+        batch_size=BATCH_SIZE
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {number}', slug=f'group-{number}',
+               description=f'Описание группы {number}')
+         for number in range(groups)]
+    )
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+    started = timezone.now() - timedelta(days=days)
+    for offset in range(0, posts, BATCH_SIZE):
+        bulk_create_posts([
+            Post(author_id=rng.choice(user_ids),
+                 group_id=rng.choice(group_ids),
+                 text=(rng.choice(texts) if texts
+                       else f'Пост номер {offset + number}'),
+                 pub_date=started + timedelta(
+                     seconds=rng.randrange(days * 86400)))
+            for number in range(min(BATCH_SIZE, posts - offset))
+        ])
+    pairs = {
+        (user_id, author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(user_ids, min(follows, len(user_ids)))
+        if user_id != author_id
+    }
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs],
+        batch_size=BATCH_SIZE
+    )
+    if comments:
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        Comment.objects.bulk_create(
+            [Comment(post_id=rng.choice(post_ids),
+                     author_id=rng.choice(user_ids),
+                     text=(rng.choice(texts) if texts
+                           else f'Комментарий {number}'))
+             for number in range(comments)],
+            batch_size=BATCH_SIZE
+        )
+    rebuild_counters()
@@ -0,0 +1,80 @@
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import cache, counters, feed, search
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Через __dict__, чтобы не грузить отложенное поле лишним запросом.
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user_posts_count(instance.author_id, 1)
+        counters.change_group_posts_count(instance.group_id, 1)
+        feed.fan_out_post(instance)
+    elif instance._initial_group_id != instance.group_id:
+        counters.change_group_posts_count(instance._initial_group_id, -1)
+        counters.change_group_posts_count(instance.group_id, 1)
+    cache.invalidate(*cache.post_scopes(instance,
+                                        instance._initial_group_id))
+    search.index_posts([instance.pk])
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user_posts_count(instance.author_id, -1)
+    counters.change_group_posts_count(instance.group_id, -1)
+    cache.invalidate(*cache.post_scopes(instance))
+    search.remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post_comments_count(instance.post_id, 1)
+        cache.invalidate(cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post_comments_count(instance.post_id, -1)
+    cache.invalidate(cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def add_followed_posts(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_followers_count(instance.author_id, 1)
+        feed.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_followed_posts(sender, instance, **kwargs):
+    counters.change_followers_count(instance.author_id, -1)
+    feed.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        cache.invalidate(cache.INDEX_SCOPE, cache.group_scope(instance.pk))
+        search.index_posts(instance.post.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_ids = list(instance.post.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def reindex_ungrouped_posts(sender, instance, **kwargs):
+    search.index_posts(getattr(instance, '_post_ids', []))
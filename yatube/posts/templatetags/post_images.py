@@ -0,0 +1,13 @@
+from django import template
+
+from posts import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(post, size):
+    """Готовая миниатюра, а пока её нет - оригинал картинки"""
+    if not post.image:
+        return None
+    return images.post_image(post, size)
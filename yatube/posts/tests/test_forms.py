@@ -1,11 +1,20 @@
-from django.test import Client, TestCase
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts import search
 from posts.models import Post, Group, User
 
 from posts.tests.constants import PROFILE_URL,\
     CREATE_URL, EDIT_URL
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
 
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -76,3 +85,103 @@ class PostCreateFormTests(TestCase):
         post.refresh_from_db()
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.pk, form_data['group'])
+
+    def test_invalid_edit_rerenders_form(self):
+        """Ошибка в форме правки - та же страница с ошибкой, не 500"""
+        url = reverse(EDIT_URL, kwargs={'post_id': self.post.id})
+        response = self.authorized_client.post(url, data={'text': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['text'])
+
+    def test_stale_edit_is_rejected(self):
+        """Правка по устаревшей версии не затирает чужое изменение"""
+        url = reverse(EDIT_URL, kwargs={'post_id': self.post.id})
+        version = self.post.version
+        self.authorized_client.post(
+            url, data={'text': 'Первая правка', 'version': version})
+        response = self.authorized_client.post(
+            url, data={'text': 'Вторая правка', 'version': version})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Первая правка')
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(response.context['version'], version + 1)
+        self.authorized_client.post(
+            url, data={'text': 'Вторая правка', 'version': version + 1})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Вторая правка')
+
+    def test_invalid_edit_keeps_stale_version(self):
+        """Ошибка в форме не подменяет открытую версию текущей"""
+        url = reverse(EDIT_URL, kwargs={'post_id': self.post.id})
+        version = self.post.version
+        self.authorized_client.post(
+            url, data={'text': 'Правка в другой вкладке',
+                       'version': version})
+        response = self.authorized_client.post(
+            url, data={'text': '', 'version': version})
+        self.assertEqual(response.context['version'], version)
+        response = self.authorized_client.post(
+            url, data={'text': 'Исправленная правка',
+                       'version': response.context['version']})
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Правка в другой вкладке')
+
+    def test_checked_edit_runs_post_save_signals(self):
+        """Правка с проверкой версии переиндексирует пост для поиска"""
+        url = reverse(EDIT_URL, kwargs={'post_id': self.post.id})
+        self.authorized_client.post(url, data={
+            'text': 'Кашалоты', 'version': self.post.version})
+        self.assertEqual(search.search_ids('кашалоты', 10), [self.post.pk])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Geek')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def make_upload(self, name, size, image_format):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Secret camera'
+        Image.new('RGB', size, 'red').save(buffer, image_format, exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_large_image_is_resized_without_metadata(self):
+        """Картинка пережимается до лимита и теряет EXIF"""
+        upload = self.make_upload('big.jpg', (4000, 1000), 'JPEG')
+        self.authorized_client.post(reverse(CREATE_URL), data={
+            'text': 'Пост с картинкой', 'image': upload})
+        post = Post.objects.get(text='Пост с картинкой')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (1920, 480))
+            self.assertFalse(image.getexif())
+
+    def test_upload_is_checked_by_header(self):
+        upload = SimpleUploadedFile('fake.png', b'not an image at all')
+        response = self.authorized_client.post(reverse(CREATE_URL), data={
+            'text': 'Не картинка', 'image': upload})
+        self.assertFormError(response, 'form', 'image',
+                             'Поддерживаются только JPEG, PNG, GIF и WEBP.')
+        self.assertFalse(Post.objects.filter(text='Не картинка').exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024 * 1024)
+    def test_too_large_upload_is_rejected(self):
+        upload = SimpleUploadedFile(
+            'huge.png', b'\x89PNG\r\n\x1a\n' + b'0' * 2 * 1024 * 1024
+        )
+        response = self.authorized_client.post(reverse(CREATE_URL), data={
+            'text': 'Огромный файл', 'image': upload})
+        self.assertFormError(response, 'form', 'image',
+                             'Файл больше 1 МБ.')
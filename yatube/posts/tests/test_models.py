@@ -1,6 +1,23 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+from importlib import import_module
+from io import StringIO
 
-from posts.models import Post, Group, User
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Job
+from posts import search
+from posts.feed import ensure_feed
+from posts.images import schedule_thumbnails
+from posts.models import Post, Group, User, Comment, UserStats, Follow
 
 
 class PostModelTest(TestCase):
@@ -58,3 +75,240 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(value).verbose_name,
                     expected)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(title='Первая', slug='first',
+                                         description='Описание')
+        cls.other_group = Group.objects.create(title='Вторая',
+                                               slug='second',
+                                               description='Описание')
+
+    def assertCounters(self, posts, first_group, second_group):
+        self.user.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, posts)
+        self.assertEqual(self.group.posts_count, first_group)
+        self.assertEqual(self.other_group.posts_count, second_group)
+
+    def test_post_counters_follow_create_move_and_delete(self):
+        """Счётчики постов меняются при создании, переносе и удалении"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        self.assertCounters(1, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(1, 0, 1)
+        post.delete()
+        self.assertCounters(0, 0, 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_rebuild_counters_command(self):
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        UserStats.objects.update(posts_count=0)
+        Group.objects.update(posts_count=5)
+        Post.objects.update(comments_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(1, 1, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='archivist')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Архив', slug='archive',
+                                         description='Старые посты')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'posts.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, records):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def import_posts(self, *args):
+        call_command('import_posts', self.path, '--batch-size', '2',
+                     *args, stdout=StringIO())
+
+    def test_import_keeps_dates_counters_feeds_and_search(self):
+        ensure_feed(self.reader)
+        self.write([
+            {'author': 'archivist', 'text': f'Старый пост {number}',
+             'group': 'archive', 'pub_date': f'2015-01-0{number}T10:00:00'}
+            for number in range(1, 6)
+        ])
+        self.import_posts()
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(posts.count(), 5)
+        self.assertEqual(posts.earliest('pub_date').pub_date.year, 2015)
+        self.author.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 5)
+        self.assertEqual(self.group.posts_count, 5)
+        self.assertEqual(self.reader.feed_entries.count(), 5)
+        self.assertEqual(len(search.search_ids('старый', 10)), 5)
+
+    def test_import_after_newest_post_was_deleted(self):
+        """pk удалённого поста не переиспользуется, даты и лента верны"""
+        ensure_feed(self.reader)
+        Post.objects.create(author=self.author, text='Удалённый').delete()
+        self.write([
+            {'author': 'archivist', 'text': f'После удаления {number}',
+             'pub_date': f'2016-02-0{number}T10:00:00'}
+            for number in range(1, 4)
+        ])
+        self.import_posts()
+        posts = Post.objects.filter(author=self.author).order_by('pk')
+        self.assertEqual([post.pub_date.day for post in posts], [1, 2, 3])
+        self.assertEqual(
+            set(self.reader.feed_entries.values_list('post_id', flat=True)),
+            {post.pk for post in posts})
+
+    def test_import_resumes_after_bad_record(self):
+        records = [{'author': 'archivist', 'text': f'Пост {number}'}
+                   for number in range(5)]
+        records[3]['author'] = 'nobody'
+        self.write(records)
+        with self.assertRaises(CommandError):
+            self.import_posts()
+        self.assertEqual(Post.objects.count(), 2)
+        self.import_posts('--resume', '--create-missing')
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertTrue(User.objects.filter(username='nobody').exists())
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_import_reads_csv(self):
+        path = os.path.join(self.tmp.name, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['author', 'text', 'group'])
+            writer.writerow(['archivist', 'Из таблицы', ''])
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get(text='Из таблицы')
+        self.assertIsNone(post.group)
+
+
+class ExportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='exporter')
+        cls.reader = User.objects.create_user(username='analyst')
+        cls.post = Post.objects.create(author=cls.author, text='Выгрузка')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def export(self, *args):
+        call_command('export_data', *args, '--output-dir', self.tmp.name,
+                     '--chunk-size', '1', stdout=StringIO())
+
+    def test_export_writes_gzipped_jsonl_for_all_tables(self):
+        self.export('--gzip')
+        path = os.path.join(self.tmp.name, 'posts.jsonl.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Выгрузка')
+        for name in ('comments', 'follows'):
+            self.assertTrue(os.path.exists(
+                os.path.join(self.tmp.name, f'{name}.jsonl.gz')))
+
+    def test_export_since_skips_unchanged_rows(self):
+        moment = timezone.now()
+        Post.objects.create(author=self.author, text='Новый')
+        self.export('posts', '--format', 'csv', '--since',
+                    moment.isoformat())
+        with open(os.path.join(self.tmp.name, 'posts.csv'),
+                  encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row['text'] for row in rows], ['Новый'])
+
+    def test_edited_post_is_exported_again(self):
+        moment = timezone.now()
+        self.post.text = 'Исправлено'
+        self.post.save()
+        self.export('posts', '--since', moment.isoformat())
+        with open(os.path.join(self.tmp.name, 'posts.jsonl'),
+                  encoding='utf-8') as file:
+            self.assertIn('Исправлено', file.read())
+
+
+@override_settings(JOBS_BACKEND='database')
+class ThumbnailJobTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+
+    def test_post_with_image_enqueues_thumbnails(self):
+        """Сохранение поста с картинкой ставит задачу миниатюр"""
+        post = Post.objects.create(author=self.user, text='Картина',
+                                   image='posts/picture.png')
+        schedule_thumbnails(post)
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'posts.images.generate_thumbnails')
+        self.assertEqual(json.loads(job.payload),
+                         {'name': 'posts/picture.png'})
+
+    def test_text_edit_does_not_enqueue_thumbnails_again(self):
+        """Правка текста не ставит вторую задачу, пока первая в очереди"""
+        post = Post.objects.create(author=self.user, text='Картина',
+                                   image='posts/picture.png')
+        schedule_thumbnails(post)
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                    {'text': 'Другая подпись', 'version': post.version})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Другая подпись')
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_migration_schedules_existing_images(self):
+        """Миграция ставит миниатюры картинкам, загруженным до флага"""
+        Post.objects.create(author=self.user, text='Старая',
+                            image='posts/old.png')
+        Post.objects.create(author=self.user, text='Та же картинка',
+                            image='posts/old.png')
+        Post.objects.create(author=self.user, text='Готовая',
+                            image='posts/ready.png', thumbnails_ready=True)
+        Post.objects.create(author=self.user, text='Без картинки')
+        migration = import_module(
+            'posts.migrations.0019_schedule_thumbnails')
+        migration.schedule_thumbnails(apps, None)
+        self.assertEqual(
+            [json.loads(payload) for payload in Job.objects.values_list(
+                'payload', flat=True)],
+            [{'name': 'posts/old.png'}])
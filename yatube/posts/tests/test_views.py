@@ -1,10 +1,27 @@
-from django.test import Client, TestCase
+import shutil
+import tempfile
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
+from PIL import Image
+
+from core.jobs import run_pending
+from core.models import Job
 
+from posts import notifications
+from posts.images import generate_thumbnails
 from posts.models import Post, Group, User, Comment,\
-    Follow
-from posts.utils import POSTS_PER_PAGE
+    Follow, FeedEntry, Notification, UserStats
+from posts.utils import POSTS_PER_PAGE, COMMENTS_PER_PAGE
 from posts.tests.constants import PROFILE_URL, \
     INDEX_URL, CREATE_URL, \
     GROUPS_URL, DETAIL_URL, EDIT_URL, \
@@ -84,7 +101,7 @@ class StaticURLTests(TestCase):
                          'Тестовый постик')
         self.assertEqual(response.context['post'].image,
                          self.post.image)
-        self.assertEqual(response.context['author_posts_count'].count(),
+        self.assertEqual(response.context['author_posts_count'],
                          1)
         self.assertEqual(response.context['post'].pub_date,
                          self.post.pub_date)
@@ -246,6 +263,27 @@ class StaticURLTests(TestCase):
         count_for_second_user = len(response_second.context["page_obj"])
         self.assertNotEqual(count_for_first_user, count_for_second_user)
 
+    def test_follow_twice_creates_one_subscription(self):
+        """Повторная подписка не создаёт дубликат"""
+        url = reverse('posts:profile_follow',
+                      kwargs={'username': self.new_author.username})
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        # Подписка начинается сразу со вставки, без проверочного SELECT.
+        follow_queries = [query['sql'] for query in context.captured_queries
+                          if '"posts_follow"' in query['sql']]
+        self.assertTrue(follow_queries[0].startswith('INSERT'))
+        self.authorized_client.get(url)
+        self.assertEqual(Follow.objects.filter(
+            user=self.user, author=self.new_author).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.new_author)
+
+    def test_cannot_follow_yourself(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.user.username}))
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -279,3 +317,537 @@ class PaginatorViewsTest(TestCase):
             reverse(INDEX_URL) + '?page=2')
         self.assertEqual(len(response.context['page_obj']),
                          TEST_POSTS_SECOND_PAGE)
+
+    def test_cursor_pages_cover_all_records(self):
+        """Курсорная пагинация листает посты без пропусков и повторов"""
+        response = self.authorized_client.get(
+            reverse(INDEX_URL) + '?after=')
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), POSTS_PER_PAGE)
+        self.assertTrue(first_page.has_next())
+        response = self.authorized_client.get(
+            reverse(INDEX_URL) + f'?after={first_page.next_cursor}')
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), TEST_POSTS_SECOND_PAGE)
+        self.assertFalse(second_page.has_next())
+        # «Первая» ведёт на первую страницу, не выходя из курсорного режима.
+        self.assertContains(response, 'href="?after="')
+        texts = [post.text for post in first_page] + [
+            post.text for post in second_page]
+        self.assertEqual(texts, [f'Тестовый пост №{post}'
+                                 for post in range(TEST_POSTS_ALL)])
+        response = self.authorized_client.get(
+            reverse(INDEX_URL) + f'?before={second_page.previous_cursor}')
+        self.assertEqual(list(response.context['page_obj']),
+                         list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.authorized_client.get(
+            reverse(INDEX_URL) + '?after=broken!')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_PER_PAGE)
+        self.assertFalse(page_obj.has_previous())
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов ленты не зависит от количества постов на странице"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Geek')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        urls_queries = {
+            reverse(INDEX_URL): 4,
+            reverse(GROUPS_URL, kwargs={'slug': 'test_slug'}): 5,
+            reverse(PROFILE_URL, kwargs={'username': 'Author'}): 6,
+            reverse(FOLLOW_URL_INDEX): 6,
+        }
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Первый пост')
+        # Лента подписок собирается при первом чтении.
+        self.authorized_client.get(reverse(FOLLOW_URL_INDEX))
+        single = {url: self.count_queries(url) for url in urls_queries}
+        for number in range(POSTS_PER_PAGE):
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f'Тестовый пост №{number}')
+        for url, expected in urls_queries.items():
+            with self.subTest(url=url):
+                self.assertEqual(single[url], expected)
+                self.assertEqual(self.count_queries(url), expected)
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.star = User.objects.create_user(username='star')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.client.get(reverse(FOLLOW_URL_INDEX))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_new_post_is_written_to_follower_feed(self):
+        """Новый пост сразу записывается в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed_texts(), [])
+        post = Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_texts(), ['Свежий пост'])
+
+    def test_unfollow_removes_posts_from_feed(self):
+        Post.objects.create(author=self.author, text='Пост')
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'writer'}))
+        self.assertEqual(self.feed_texts(), ['Пост'])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'writer'}))
+        self.assertEqual(self.feed_texts(), [])
+
+    def test_repeated_follow_writes_nothing(self):
+        """Повторная подписка не разносит посты и не двигает счётчик"""
+        Post.objects.create(author=self.author, text='Пост')
+        self.feed_texts()
+        url = reverse('posts:profile_follow', kwargs={'username': 'writer'})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        # Единственная запись - отбитая ограничением вставка подписки.
+        writes = [query['sql'] for query in context.captured_queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"posts_follow"', writes[0])
+        self.assertEqual(UserStats.objects.get(
+            user=self.author).followers_count, 1)
+        self.assertEqual(self.feed_texts(), ['Пост'])
+
+    def test_fan_out_reads_follower_counter(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with CaptureQueriesContext(connection) as context:
+            Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(any('COUNT(' in query['sql']
+                             and 'posts_follow' in query['sql']
+                             for query in context.captured_queries))
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_popular_author_is_read_on_the_fly(self):
+        """Посты популярного автора подмешиваются при чтении"""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+        self.feed_texts()
+        Post.objects.create(author=self.author, text='Первый')
+        Post.objects.create(author=self.star, text='Второй')
+        Post.objects.create(author=self.author, text='Третий')
+        self.assertFalse(FeedEntry.objects.filter(
+            author=self.star).exists())
+        self.assertEqual(FeedEntry.objects.filter(
+            author=self.author).count(), 2)
+        self.assertEqual(self.feed_texts(),
+                         ['Первый', 'Второй', 'Третий'])
+
+
+class FeedFragmentCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Geek')
+        cls.group = Group.objects.create(title='Группа', slug='cached',
+                                         description='Описание')
+        for number in range(TEST_POSTS_ALL):
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text=f'Пост №{number}')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_pages_are_cached_separately(self):
+        """Вторая страница не отдаёт закэшированную первую"""
+        for url in (reverse(INDEX_URL),
+                    reverse(GROUPS_URL, kwargs={'slug': 'cached'}),
+                    reverse(PROFILE_URL, kwargs={'username': 'Geek'})):
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                response = self.guest_client.get(url + '?page=2')
+                self.assertContains(response, f'Пост №{POSTS_PER_PAGE}')
+
+    def test_post_change_invalidates_its_feeds(self):
+        """Изменение поста сбрасывает кэш его ленты"""
+        url = reverse(GROUPS_URL, kwargs={'slug': 'cached'}) + '?page=2'
+        self.guest_client.get(url)
+        post = Post.objects.get(text=f'Пост №{TEST_POSTS_ALL - 1}')
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Отредактированный пост')
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PostImageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Geek')
+        image = BytesIO()
+        Image.new('RGB', (1200, 600), 'green').save(image, 'PNG')
+        default_storage.save('posts/original.png', ContentFile(
+            image.getvalue()))
+        cls.post = Post.objects.create(author=cls.user, text='С картинкой',
+                                       image='posts/original.png')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(DETAIL_URL, kwargs={'post_id': self.post.pk})
+
+    def test_original_image_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, страница показывает оригинал"""
+        response = Client().get(self.url)
+        self.assertContains(response, 'src="/media/posts/original.png"')
+
+    def test_thumbnail_job_purges_cached_pages(self):
+        """После задачи закэшированная страница отдаёт миниатюру"""
+        Client().get(self.url)
+        generate_thumbnails(name=self.post.image.name)
+        response = Client().get(self.url)
+        self.assertNotContains(response, 'src="/media/posts/original.png"')
+        self.assertContains(response, 'src="/media/cache/')
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Geek')
+        cls.post = Post.objects.create(author=cls.user, text='Вирусный')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Коммент {number}')
+            for number in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_page_renders_first_comments_page(self):
+        """Страница поста показывает только первую страницу комментариев"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse(DETAIL_URL, kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertLess(len(context.captured_queries), 10)
+
+    def test_comments_fragment_returns_next_page(self):
+        response = self.client.get(
+            reverse(DETAIL_URL, kwargs={'post_id': self.post.pk}))
+        first_page = response.context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': first_page.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        second_page = response.context['comments']
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(set(first_page) & set(second_page))
+
+
+class SearchViewTest(TestCase):
+    def setUp(self):
+        # Тесты меняют и удаляют посты, поэтому данные свои у каждого.
+        self.user = User.objects.create_user(username='Seeker')
+        self.admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass')
+        self.group = Group.objects.create(title='Котики', slug='cats',
+                                          description='Про котов')
+        self.in_text = Post.objects.create(author=self.user,
+                                           text='Пишу про котики и собак')
+        self.in_group = Post.objects.create(author=self.user,
+                                            group=self.group,
+                                            text='Сегодня котики спали')
+        self.other = Post.objects.create(author=self.user, text='Про собак')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_group_title_matches_higher(self):
+        self.assertEqual(self.search('Котики'), [self.in_group, self.in_text])
+
+    def test_search_requires_all_words(self):
+        self.assertEqual(self.search('котики собак'), [self.in_text])
+
+    def test_index_follows_post_changes(self):
+        self.other.text = 'Теперь и про котики'
+        self.other.save()
+        self.assertIn(self.other, self.search('котики'))
+        self.in_text.delete()
+        self.assertNotIn(self.in_text, self.search('котики'))
+
+    def test_index_follows_group_changes(self):
+        self.group.title = 'Ежи'
+        self.group.save()
+        self.assertEqual(self.search('ежи'), [self.in_group])
+        self.group.delete()
+        self.assertEqual(self.search('ежи'), [])
+
+    def test_empty_query_returns_nothing(self):
+        self.assertEqual(self.search(''), [])
+
+    def test_admin_search_uses_index(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'собак'})
+        self.assertEqual(set(response.context['cl'].result_list),
+                         {self.in_text, self.other})
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Лента', slug='feed',
+                                         description='Группа')
+        Post.objects.create(author=cls.author, group=cls.group,
+                            text='Первый пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:api_index'),
+            reverse('posts:api_groups', kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:api_follow_index'),
+        ]
+
+    def test_feeds_return_json_with_validators(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                posts = response.json()['results']
+                self.assertEqual(posts[0]['text'], 'Первый пост')
+                self.assertEqual(posts[0]['author'], 'Writer')
+
+    def test_unchanged_feed_answers_not_modified(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(context.captured_queries), 4)
+
+    def test_new_or_edited_post_changes_etag(self):
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        post = Post.objects.create(author=self.author, text='Второй')
+        new_etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, new_etag)
+        post.text = 'Второй, исправленный'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=new_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_changes_validators(self):
+        """Правка поста даёт 200 и по ETag, и по If-Modified-Since"""
+        for url in (reverse('posts:api_index'),
+                    reverse('posts:api_follow_index')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                time.sleep(1)
+                post = Post.objects.get(author=self.author)
+                post.text = f'Исправлено для {url}'
+                post.save()
+                for header, value in (
+                        ('HTTP_IF_NONE_MATCH', response['ETag']),
+                        ('HTTP_IF_MODIFIED_SINCE',
+                         response['Last-Modified'])):
+                    self.assertEqual(
+                        self.client.get(url, **{header: value}).status_code,
+                        200)
+
+    def test_follow_feed_validators_skip_post_join(self):
+        url = reverse('posts:api_follow_index')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertFalse(any('"posts_post"' in query['sql']
+                             for query in context.captured_queries))
+
+    def test_missing_group_is_not_found(self):
+        response = self.client.get(
+            reverse('posts:api_groups', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Cached')
+        cls.post = Post.objects.create(author=cls.user, text='Кэш')
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse(DETAIL_URL,
+                                  kwargs={'post_id': self.post.pk})
+
+    def test_anonymous_hit_skips_view(self):
+        self.client.get(reverse(INDEX_URL))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(INDEX_URL))
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertIsNone(response.context)
+        self.assertContains(response, 'Кэш')
+
+    def test_pages_vary_on_query_string(self):
+        self.client.get(reverse(INDEX_URL))
+        response = self.client.get(reverse(INDEX_URL), {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_authenticated_user_bypasses_cache(self):
+        self.client.get(self.detail_url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertIsNotNone(response.context)
+        self.assertTrue(response.context['user'].is_authenticated)
+
+    def test_comment_purges_post_page(self):
+        self.client.get(self.detail_url)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Свежий комментарий')
+        self.assertContains(self.client.get(self.detail_url),
+                            'Свежий комментарий')
+
+    def test_new_post_purges_index(self):
+        self.client.get(reverse(INDEX_URL))
+        Post.objects.create(author=self.user, text='Новенький')
+        self.assertContains(self.client.get(reverse(INDEX_URL)),
+                            'Новенький')
+
+
+@override_settings(JOBS_BACKEND='database')
+class NotificationTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer')
+        self.readers = [User.objects.create_user(username=f'reader{number}')
+                        for number in range(3)]
+        Follow.objects.bulk_create(Follow(user=reader, author=self.author)
+                                   for reader in self.readers)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.readers[0])
+
+    def unread(self, client):
+        response = client.get(reverse('posts:api_unread_notifications'))
+        return response.json()['unread']
+
+    def test_new_post_notifies_followers_in_batches(self):
+        """Пост ставит задачу, задача пишет уведомления пачками"""
+        self.author_client.post(reverse(CREATE_URL), {'text': 'Новость'})
+        self.assertFalse(Notification.objects.exists())
+        with patch.object(notifications, 'NOTIFY_BATCH_SIZE', 2), \
+                CaptureQueriesContext(connection) as queries:
+            run_pending()
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT INTO '
+                                              '"posts_notification"')]
+        self.assertEqual(len(inserts), 2)
+        post = Post.objects.get()
+        self.assertEqual(
+            set(Notification.objects.filter(post=post).values_list(
+                'user_id', flat=True)),
+            {reader.pk for reader in self.readers})
+        self.assertEqual(self.unread(self.reader_client), 1)
+
+    def test_retry_does_not_duplicate_notifications(self):
+        """Повтор задачи продолжает с последней записанной пачки"""
+        post = Post.objects.create(author=self.author, text='Новость')
+        notifications.notify_followers(post_id=post.pk)
+        notifications.notify_followers(post_id=post.pk)
+        self.assertEqual(Notification.objects.count(), len(self.readers))
+
+    def test_unread_count_is_read_from_counter(self):
+        """Число непрочитанных отдаётся без COUNT по уведомлениям"""
+        post = Post.objects.create(author=self.author, text='Новость')
+        notifications.notify_followers(post_id=post.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.unread(self.reader_client), 1)
+        self.assertFalse(any('posts_notification' in query['sql']
+                             for query in queries.captured_queries))
+
+    def test_notifications_page_marks_only_shown_read(self):
+        """Прочитанными становятся только уведомления открытой страницы"""
+        for number in range(POSTS_PER_PAGE + 2):
+            post = Post.objects.create(author=self.author,
+                                       text=f'Новость {number}')
+            notifications.notify_followers(post_id=post.pk)
+        response = self.reader_client.get(reverse('posts:notifications'))
+        self.assertContains(response, 'новый пост')
+        self.assertEqual(self.unread(self.reader_client), 2)
+        self.assertEqual(Notification.objects.filter(
+            user=self.readers[0], read=False).count(), 2)
+
+    def test_comment_and_follow_notify_author(self):
+        post = Post.objects.create(author=self.author, text='Новость')
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Отлично'})
+        newcomer = Client()
+        newcomer.force_login(User.objects.create_user(username='newcomer'))
+        follow_url = reverse('posts:profile_follow',
+                             kwargs={'username': self.author.username})
+        newcomer.get(follow_url)
+        newcomer.get(follow_url)
+        self.assertEqual(Job.objects.filter(
+            name='posts.notifications.notify_follow').count(), 1)
+        run_pending(limit=10)
+        self.assertEqual(
+            sorted(self.author.notifications.values_list('kind', flat=True)),
+            [Notification.NEW_COMMENT, Notification.NEW_FOLLOWER])
+        self.assertEqual(self.unread(self.author_client), 2)
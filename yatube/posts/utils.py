@@ -1,9 +1,24 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Q, Value, When
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Post
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Два параметра на пост в CASE: держимся ниже лимита переменных SQLite.
+PUB_DATE_BATCH_SIZE = 400
 
 
 def get_pag(obj, request):
+    if is_cursor_request(request):
+        return get_cursor_pag(obj, request)
     paginator = Paginator(obj, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -12,3 +27,188 @@ def get_pag(obj, request):
         'page_number': page_number,
         'page_obj': page_obj
     }
+
+
+def is_cursor_request(request):
+    """Курсорный режим включается настройкой или параметрами запроса."""
+    if 'after' in request.GET or 'before' in request.GET:
+        return True
+    return getattr(settings, 'POSTS_PAGINATION', 'page') == 'cursor'
+
+
+def get_cursor_pag(obj, request, key='pub_date', per_page=POSTS_PER_PAGE):
+    paginator = CursorPaginator(obj, per_page, key=key)
+    page_obj = paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    return {
+        'paginator': paginator,
+        'cursor_mode': True,
+        'page_obj': page_obj
+    }
+
+
+def get_comments_page(post_id, after=None):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE, key='-created')
+    return paginator.get_page(after=after)
+
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (значение ключа, pk) или None для битого курсора."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit('|', 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator,
+                 has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0])
+
+
+class CursorPaginator:
+    """Пагинация по ключу (key, tiebreaker) без COUNT(*) и OFFSET.
+
+    Ключ с минусом (например '-created') листает по убыванию.
+    Каждая страница стоит одного запроса с LIMIT per_page + 1.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date',
+                 tiebreaker='pk'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.descending = key.startswith('-')
+        self.key = key.lstrip('-')
+        self.tiebreaker = tiebreaker
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.key),
+                             getattr(obj, self.tiebreaker))
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return f'{prefix}{self.key}', f'{prefix}{self.tiebreaker}'
+
+    def _seek(self, queryset, cursor, forward):
+        value, pk = cursor
+        lookup = 'lt' if self.descending == forward else 'gt'
+        return queryset.filter(
+            Q(**{f'{self.key}__{lookup}': value})
+            | Q(**{self.key: value, f'{self.tiebreaker}__{lookup}': pk})
+        )
+
+    def _fetch(self, cursor, forward):
+        """До per_page + 1 строк за курсором в порядке обхода"""
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = self._seek(queryset, cursor, forward)
+        return list(queryset.order_by(*self._ordering(reverse=not forward))
+                    [:self.per_page + 1])
+
+    def get_page(self, after=None, before=None):
+        after, before = decode_cursor(after), decode_cursor(before)
+        if before is not None:
+            rows = self._fetch(before, forward=False)
+            has_previous = len(rows) > self.per_page
+            return CursorPage(rows[:self.per_page][::-1], self,
+                              has_next=True, has_previous=has_previous)
+        rows = self._fetch(after, forward=True)
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next=has_next,
+                          has_previous=after is not None)
+
+
+def get_posts_count(user):
+    """Число постов автора из UserStats, без COUNT по таблице постов."""
+    try:
+        return user.stats.posts_count
+    except ObjectDoesNotExist:
+        return 0
+
+
+def bulk_create_posts(posts):
+    """bulk_create, который сохраняет pub_date постов как есть.
+
+    Для импорта и генерации данных, где дата приходит извне: auto_now_add
+    ставит при вставке текущее время, поэтому даты возвращаются
+    следующими UPDATE ... CASE по pk вставленных строк. Поле модели не
+    трогается, и параллельные сохранения в других потоках не страдают.
+    Возвращает посты с проставленными pk.
+    """
+    dates = [post.pub_date for post in posts]
+    with transaction.atomic():
+        Post.objects.bulk_create(posts)
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # SQLite не возвращает pk. Считать их от прежнего MAX(pk)
+            # нельзя: AUTOINCREMENT не отдаёт pk удалённых постов. После
+            # вставки транзакция держит блокировку записи, поэтому наши
+            # строки - последние по pk.
+            pks = Post.objects.order_by('-pk').values_list(
+                'pk', flat=True)[:len(posts)]
+            for post, pk in zip(posts, reversed(list(pks))):
+                post.pk = pk
+        for start in range(0, len(posts), PUB_DATE_BATCH_SIZE):
+            chunk = posts[start:start + PUB_DATE_BATCH_SIZE]
+            Post.objects.filter(
+                pk__gte=chunk[0].pk, pk__lte=chunk[-1].pk
+            ).update(pub_date=Case(
+                *[When(pk=post.pk, then=Value(date))
+                  for post, date in zip(chunk, dates[start:])],
+                output_field=DateTimeField(),
+            ))
+    for post, date in zip(posts, dates):
+        post.pub_date = date
+    return posts
@@ -1,20 +1,34 @@
 from django.core.paginator import Paginator
+from django.utils.http import urlencode
 from django.shortcuts import render, get_object_or_404, \
     redirect
 
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 
-from .models import Group, Post, User, Comment, Follow
+from core.cache import cache_anonymous_page
+from core.ratelimit import ratelimit
+from core.routers import replica_reads
 
+from .models import Group, Post, PostEditConflict, User, Follow
+
+from . import cache, feed, images, notifications, search
 from .forms import PostForm, CommentForm
-from .utils import get_pag
+from .utils import (POSTS_PER_PAGE, get_pag, get_cursor_pag,
+                    get_posts_count, get_comments_page)
 
 
+@replica_reads
+@cache_anonymous_page(cache.index_page_scopes)
 def index(request):
-    context = get_pag(Post.objects.all(), request)
+    context = get_pag(Post.objects.select_related('author', 'group'),
+                      request)
+    context.update(cache.fragment_context(cache.INDEX_SCOPE))
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@cache_anonymous_page(cache.group_page_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.post.all()
@@ -22,12 +36,17 @@ def group_posts(request, slug):
         'group': group,
         'posts': posts,
     }
-    context.update(get_pag(group.post.all(), request))
+    context.update(get_pag(posts.select_related('author', 'group'),
+                           request))
+    context.update(cache.fragment_context(cache.group_scope(group.pk)))
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
+@cache_anonymous_page(cache.profile_page_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -38,24 +57,53 @@ def profile(request, username):
         'author': author,
         'following': following
     }
-    context.update(get_pag(author.post.all(), request))
+    context.update(get_pag(author.post.select_related('author', 'group'),
+                           request))
+    context.update(cache.fragment_context(cache.profile_scope(author.pk)))
     return render(request, 'posts/profile.html', context)
 
 
+@replica_reads
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.SearchResults(query), POSTS_PER_PAGE)
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+        'paginator': paginator,
+        'page_obj': paginator.get_page(request.GET.get('page'))
+    })
+
+
+@replica_reads
+@cache_anonymous_page(cache.post_page_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
     form = CommentForm(request.POST or None)
-    comment = Comment.objects.filter(post=post)
-    author_posts_count = Post.objects.filter(author=post.author)
+    author_posts_count = get_posts_count(post.author)
     return render(request, 'posts/post_detail.html', {
         'post': post,
         'author_posts_count': author_posts_count,
         'form': form,
-        'comments': comment
+        'comments': get_comments_page(post.pk)
+    })
+
+
+@replica_reads
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML"""
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': get_comments_page(post_id,
+                                      after=request.GET.get('after'))
     })
 
 
 @login_required
+@ratelimit('post_create')
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None
@@ -63,36 +111,61 @@ def post_create(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        with transaction.atomic():
+            new_post.save()
+            images.schedule_thumbnails(new_post)
+            notifications.notify_followers.delay(post_id=new_post.pk)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create.html', {'form': form})
 
 
+def _posted_version(request, post):
+    """Версия поста, с которой пользователь открыл форму"""
+    try:
+        return int(request.POST['version'])
+    except (KeyError, ValueError):
+        return post.version
+
+
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if post.author == request.user:
-        if request.method == 'POST':
-            form = PostForm(request.POST,
-                            files=request.FILES,
-                            instance=post)
-            if form.is_valid():
-                form.save()
-                return redirect('posts:post_detail',
-                                post_id=post_id
-                                )
-            else:
-                raise ValueError
-        else:
-            form = PostForm(instance=post)
-            return render(request,
-                          'posts/create.html',
-                          {'form': form, 'is_edit': True})
-    else:
+    if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
+    form = PostForm(request.POST or None,
+                    files=request.FILES or None,
+                    instance=post)
+    # Форма с ошибкой хранит версию, которую открыл пользователь, а не
+    # текущую: иначе повторная отправка затрёт чужую правку.
+    version = _posted_version(request, post)
+    if form.is_valid():
+        try:
+            with transaction.atomic():
+                post = form.save(commit=False)
+                image_changed = 'image' in form.changed_data
+                if image_changed:
+                    post.thumbnails_ready = False
+                post.save_checked(version)
+                # Задача для прежней картинки, возможно, ещё в очереди.
+                if image_changed:
+                    images.schedule_thumbnails(post)
+        except PostEditConflict:
+            form.add_error(None, 'Пост успели изменить, пока вы его '
+                                 'редактировали. Проверьте текст и '
+                                 'сохраните ещё раз.')
+            version = Post.objects.values_list('version', flat=True).get(
+                pk=post_id)
+        else:
+            return redirect('posts:post_detail', post_id=post_id)
+    return render(request, 'posts/create.html', {
+        'form': form,
+        'is_edit': True,
+        'version': version,
+    })
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -100,37 +173,55 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+            notifications.notify_comment.delay(comment_id=comment.pk)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    follow = True
     context = {
-        'posts': posts,
-        'follow': follow
+        'follow': True
     }
-    context.update(get_pag(posts.all(), request))
+    context.update(feed.get_feed_pag(request.user, request))
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if (
-            author != request.user
-            and not Follow.objects.filter(user=request.user,
-                                          author=author).exists()
-    ):
-        Follow.objects.create(user=request.user, author=author)
-        return redirect('posts:profile', username)
+    if author != request.user:
+        # Одна вставка: повторную подписку отбивает UniqueConstraint, и
+        # в точке сохранения откатывается только она. post_save, а с
+        # ним лента, счётчик и уведомление - только для новой подписки.
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+                notifications.notify_follow.delay(user_id=request.user.pk,
+                                                  author_id=author.pk)
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username)
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect("posts:profile", username)
+
+
+@login_required
+def notifications_list(request):
+    context = get_cursor_pag(
+        request.user.notifications.select_related('actor'),
+        request, key='-created')
+    # Прочитанными становятся только показанные на этой странице.
+    context['unread'] = {item.pk for item in context['page_obj']
+                         if not item.read}
+    if context['unread']:
+        notifications.mark_read(request.user, context['unread'])
+    return render(request, 'posts/notifications.html', context)
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.TimingMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,6 +67,8 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
+        # Без явных loaders Django при DEBUG = False сам оборачивает их в
+        # cached.Loader: шаблоны компилируются один раз на процесс.
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -87,10 +91,38 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': str(os.path.join(BASE_DIR, "db.sqlite3"))
+        'NAME': str(os.path.join(BASE_DIR, "db.sqlite3")),
+        # Соединение живёт между запросами вместе со своими PRAGMA.
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 600)),
     }
 }
 
+# Реплики для чтения в GET-запросах (core.routers). Локально - второй
+# файл SQLite, например копия db.sqlite3 или `migrate --database replica`.
+DATABASE_REPLICAS = []
+if os.getenv('YATUBE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('YATUBE_REPLICA_DB'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Сколько секунд после запроса с записью пользователь читает с primary.
+REPLICA_STICKY_SECONDS = 10
+
+# Выполняются core.db на каждом новом соединении SQLite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -131,6 +163,17 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки больше 256 КБ сразу пишутся во временный файл, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'posts.images.LimitedUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Длинная сторона картинки после пережатия.
+POST_IMAGE_MAX_SIDE = 1920
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -141,10 +184,78 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# 'page' - нумерованные страницы, 'cursor' - ?after=/?before= без COUNT(*)
+POSTS_PAGINATION = os.getenv('POSTS_PAGINATION', 'page')
+
+# Авторы с большим числом подписчиков не разносятся по лентам при записи,
+# их посты подмешиваются в follow_index при чтении.
+FEED_FANOUT_LIMIT = 1000
+
+# Фрагменты лент сбрасываются сигналами Post, TTL только страхует.
+FEED_CACHE_TTL = 60 * 60 * 24
+
+# Страницы лент и постов для анонимов, сбрасываются теми же сигналами.
+PAGE_CACHE_TTL = 60 * 10
+
+# Очередь core.jobs: 'database' - таблица задач и воркер run_jobs,
+# 'thread' - пул потоков в процессе сервера (с SQLite спорит с
+# запросами за блокировку записи, поэтому только по явному выбору).
+JOBS_BACKEND = os.getenv('YATUBE_JOBS', 'database')
+JOBS_CONCURRENCY = 2
+# Через сколько секунд задачу упавшего воркера можно забрать снова.
+JOBS_LOCK_TIMEOUT = 60 * 5
+# Сколько дней хранить выполненные задачи.
+JOBS_RETENTION_DAYS = 7
+
+# Лимиты core.ratelimit на запись: запросов за секунду/минуту/час/день
+# с одного пользователя, для анонимов - с одного IP.
+RATE_LIMITS = {
+    'post_create': '10/m',
+    'add_comment': '20/m',
+    'follow': '30/m',
+    'signup': '5/h',
+}
+
+# Доля запросов, которые замеряет core.middleware.TimingMiddleware.
+TIMING_SAMPLE_RATE = float(
+    os.getenv('YATUBE_TIMING_SAMPLE_RATE', 1.0 if DEBUG else 0.1))
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Кэш общий для всех воркеров: 'file' (по умолчанию без DEBUG) и 'db'
+# не требуют внешних сервисов, 'memcached' и 'redis' - по желанию
+# (нужны python-memcached или django-redis). 'db' требует
+# `manage.py createcachetable`. 'locmem' живёт внутри одного процесса.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+}
+CACHE_BACKEND = os.getenv('YATUBE_CACHE', 'locmem' if DEBUG else 'file')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'yatube',
     }
 }
+if os.getenv('YATUBE_CACHE_LOCATION'):
+    CACHES['default']['LOCATION'] = os.getenv('YATUBE_CACHE_LOCATION')
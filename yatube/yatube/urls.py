@@ -4,11 +4,14 @@ from django.urls import path, include
 
 from django.conf.urls.static import static
 
+from core.views import metrics
+
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('', include('posts.urls', namespace='app_posts')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('admin/metrics/', metrics, name='metrics'),
     path('admin/', admin.site.urls),
 ]
 